@@ -0,0 +1,324 @@
+import argparse
+import itertools
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from mapping_store import StateTuple, compile_or_report, file_stamp, format_key, migrate_rules, parse_key
+
+TABLE_PATH = "mapping.bin"
+
+# Layout of mapping.bin (native byte order):
+#   header   magic, version, id size, entries, schema length,
+#            programs offset, programs length
+#   schema   signals.json the table was built for, as JSON
+#   ids      one uint16 program id per combination, 8-byte aligned,
+#            indexed by the mixed-radix number of the state indices with
+#            the last signal varying fastest (itertools.product order)
+#   programs JSON list of task lists; id 0 is always null (unassigned)
+MAGIC = b"RHAT"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIIII")
+_ID = "H"
+_ID_SIZE = 2
+MAX_PROGRAMS = 0xFFFF
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _strides(signals: Dict[str, List[str]]) -> List[int]:
+    strides = []
+    stride = 1
+    for states in reversed(list(signals.values())):
+        strides.append(stride)
+        stride *= len(states)
+    strides.reverse()
+    return strides
+
+
+def _offsets(signals: Dict[str, List[str]]) -> List[Dict[str, int]]:
+    # state -> state index * stride, per signal position
+    return [{state: i * stride for i, state in enumerate(states)}
+            for states, stride in zip(signals.values(), _strides(signals))]
+
+
+def write_table(path: str, signals: Dict[str, List[str]], programs: List[Optional[List[str]]], ids: array):
+    schema = json.dumps(signals).encode()
+    programs_bytes = json.dumps(programs).encode()
+    array_offset = _align(_HEADER.size + len(schema))
+    programs_offset = array_offset + len(ids) * _ID_SIZE
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, _ID_SIZE, len(ids), len(schema), programs_offset, len(programs_bytes)))
+        file.write(schema)
+        file.write(bytes(array_offset - _HEADER.size - len(schema)))
+        file.write(ids.tobytes())
+        file.write(programs_bytes)
+    # readers keep their mapping of the old inode until they next refresh
+    os.replace(tmp_path, path)
+
+
+class LoadedTable(NamedTuple):
+    # What an ActionTable lookup reads, published as one reference. ids is
+    # the shared mapping, written in place; programs and compiled only grow.
+    offsets: List[Dict[str, int]]
+    ids: Optional[memoryview]
+    programs: List[Optional[List[str]]]
+    compiled: List[object]
+
+
+class ActionTable:
+    # Fully enumerated mapping held in mapping.bin and opened with mmap, so
+    # startup does not parse the combinations and several processes share
+    # one page-cache copy. A lookup is one offset add per signal and one
+    # array read, on the LoadedTable the last refresh() published, without
+    # a lock. Writes through this object are visible at once; refresh()
+    # stats the file for outside changes (another process exporting a new
+    # table) at most every check_interval seconds, or at once after
+    # invalidate(). Writers must be serialised by the caller.
+    def __init__(self, path: str = TABLE_PATH, compiler=None, check_interval: float = 1.0):
+        self.path = path
+        self.compiler = compiler
+        self.check_interval = check_interval
+        self._checked = 0.0
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+        self._ids: Optional[memoryview] = None
+        self._signals: Dict[str, List[str]] = {}
+        self._offsets: List[Dict[str, int]] = []
+        self._programs: List[Optional[List[str]]] = [None]
+        self._program_ids: Dict[str, int] = {json.dumps(None): 0}
+        self._compiled: List[object] = [None]
+        self._programs_offset = 0
+        self._published = LoadedTable([], None, self._programs, self._compiled)
+
+    def _close(self):
+        # lookups may still be reading the old mapping; it is unmapped once
+        # the last of them lets go of it
+        if self._file is not None:
+            self._file.close()
+        self._file = self._mmap = self._view = self._ids = None
+
+    def invalidate(self):
+        self._stamp = None
+
+    def refresh(self):
+        if self._stamp is not None:
+            now = time.monotonic()
+            if now - self._checked < self.check_interval:
+                return
+            self._checked = now
+        stamp = file_stamp(self.path)
+        if stamp is not None and stamp == self._stamp:
+            return
+        self._close()
+        self._signals = {}
+        self._offsets = []
+        self._programs = [None]
+        self._program_ids = {json.dumps(None): 0}
+        self._compiled = [None]
+        self._stamp = stamp
+        self._checked = time.monotonic()
+        if stamp is None:
+            self._publish()
+            return
+        file = open(self.path, "r+b")
+        magic, version, id_size, entries, schema_len, programs_offset, programs_len = _HEADER.unpack(file.read(_HEADER.size))
+        if magic != MAGIC or version != VERSION or id_size != _ID_SIZE:
+            file.close()
+            raise ValueError(f"{self.path} is not a version {VERSION} action table")
+        self._signals = json.loads(file.read(schema_len))
+        file.seek(programs_offset)
+        self._programs = json.loads(file.read(programs_len))
+        self._program_ids = {json.dumps(tasks): i for i, tasks in enumerate(self._programs)}
+        self._compiled = [self._compile(tasks) for tasks in self._programs]
+        self._programs_offset = programs_offset
+        array_offset = _align(_HEADER.size + schema_len)
+        self._file = file
+        self._mmap = mmap.mmap(file.fileno(), programs_offset)
+        self._view = memoryview(self._mmap)[array_offset:programs_offset]
+        self._ids = self._view.cast(_ID)
+        self._offsets = _offsets(self._signals)
+        self._publish()
+
+    def _publish(self):
+        self._published = LoadedTable(self._offsets, self._ids, self._programs, self._compiled)
+
+    def _compile(self, tasks):
+        if self.compiler is None or tasks is None:
+            return None
+        return compile_or_report(self.compiler, tasks, self.path)
+
+    def _pid(self, table: LoadedTable, states: StateTuple) -> int:
+        if table.ids is None or len(states) != len(table.offsets):
+            return 0
+        index = 0
+        try:
+            for offsets, state in zip(table.offsets, states):
+                index += offsets[state]
+        except KeyError:
+            return 0
+        pid = table.ids[index]
+        if pid >= len(table.programs):
+            # the ids are shared through the mmap, but another writer has
+            # interned a program since the list was last read; the next
+            # refresh() reads it again
+            self.invalidate()
+            return 0
+        return pid
+
+    def lookup(self, states: StateTuple) -> Optional[List[str]]:
+        table = self._published
+        return table.programs[self._pid(table, states)]
+
+    def lookup_program(self, states: StateTuple):
+        table = self._published
+        return table.compiled[self._pid(table, states)]
+
+    def _intern(self, tasks: Optional[List[str]]) -> int:
+        key = json.dumps(tasks)
+        pid = self._program_ids.get(key)
+        if pid is not None:
+            return pid
+        if len(self._programs) > MAX_PROGRAMS:
+            raise ValueError(f"{self.path} cannot hold more than {MAX_PROGRAMS} distinct action programs")
+        self._programs.append(tasks)
+        self._compiled.append(self._compile(tasks))
+        pid = self._program_ids[key] = len(self._programs) - 1
+        # the programs list lives after the id array, outside the mapping
+        programs_bytes = json.dumps(self._programs).encode()
+        header = _HEADER.pack(MAGIC, VERSION, _ID_SIZE, len(self._ids), len(json.dumps(self._signals).encode()),
+                              self._programs_offset, len(programs_bytes))
+        self._file.seek(self._programs_offset)
+        self._file.write(programs_bytes)
+        self._file.truncate()
+        self._file.flush()
+        self._mmap[:_HEADER.size] = header
+        return pid
+
+    def assign(self, pattern, tasks: Optional[List[str]]) -> int:
+        self.refresh()
+        if self._ids is None or len(pattern) != len(self._offsets):
+            return 0
+        choices = []
+        for offsets, state in zip(self._offsets, pattern):
+            if state == "*":
+                choices.append(list(offsets.values()))
+            elif state in offsets:
+                choices.append([offsets[state]])
+            else:
+                return 0
+        pid = self._intern(tasks)
+        ids = self._ids
+        matched = 0
+        for parts in itertools.product(*choices):
+            ids[sum(parts)] = pid
+            matched += 1
+        self._mmap.flush()
+        self._stamp = file_stamp(self.path)
+        return matched
+
+    def _combo(self, index: int) -> StateTuple:
+        states = []
+        for values in reversed(list(self._signals.values())):
+            index, i = divmod(index, len(values))
+            states.append(values[i])
+        return tuple(reversed(states))
+
+    def assigned(self) -> Dict[StateTuple, List[str]]:
+        self.refresh()
+        if self._ids is None:
+            return {}
+        return {self._combo(i): self._programs[pid] for i, pid in enumerate(self._ids) if pid}
+
+    def reset(self, signals: Dict[str, List[str]]):
+        entries = 1
+        for states in signals.values():
+            entries *= len(states)
+        self._close()
+        write_table(self.path, signals, [None], array(_ID, [0]) * entries)
+        self._stamp = None
+        self.refresh()
+
+    def migrate(self, old_signals: Dict[str, List[str]], new_signals: Dict[str, List[str]]):
+        # The table embeds the schema it was built for, which is what its
+        # combinations are decoded against
+        rules, conflicts = migrate_rules(self.assigned(), self._signals or old_signals, new_signals)
+        self.reset(new_signals)
+        for pattern, tasks in rules.items():
+            self.assign(pattern, tasks)
+        return conflicts
+
+    def view(self) -> Iterator[Tuple[str, Optional[List[str]]]]:
+        self.refresh()
+        if self._ids is None:
+            return
+        programs = self._programs
+        for combo, pid in zip(itertools.product(*self._signals.values()), self._ids):
+            yield format_key(combo), programs[pid]
+
+    def __len__(self):
+        self.refresh()
+        return 0 if self._ids is None else len(self._ids)
+
+
+def export_table(mapping_path: str, signals_path: str, table_path: str) -> int:
+    # mapping.json -> mapping.bin; returns the number of mapping keys that
+    # do not fit signals.json and were skipped
+    with open(signals_path, "r") as file:
+        signals = json.load(file)
+    with open(mapping_path, "r") as file:
+        mapping = json.load(file)
+    offsets = _offsets(signals)
+    entries = 1
+    for states in signals.values():
+        entries *= len(states)
+    ids = array(_ID, [0]) * entries
+    programs: List[Optional[List[str]]] = [None]
+    program_ids = {json.dumps(None): 0}
+    skipped = 0
+    for key, tasks in mapping.items():
+        states = parse_key(key)
+        if len(states) != len(offsets) or any(s not in o for o, s in zip(offsets, states)):
+            skipped += 1
+            continue
+        pid = program_ids.get(json.dumps(tasks))
+        if pid is None:
+            programs.append(tasks)
+            pid = program_ids[json.dumps(tasks)] = len(programs) - 1
+            if pid > MAX_PROGRAMS:
+                raise ValueError(f"more than {MAX_PROGRAMS} distinct action programs")
+        ids[sum(o[s] for o, s in zip(offsets, states))] = pid
+    write_table(table_path, signals, programs, ids)
+    return skipped
+
+
+def import_table(table_path: str, mapping_path: str):
+    # mapping.bin -> mapping.json
+    table = ActionTable(table_path)
+    data = dict(table.view())
+    with open(mapping_path, "w") as file:
+        json.dump(data, file, indent=4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert between mapping.json and the binary action table")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("--mapping", default="mapping.json")
+    parser.add_argument("--signals", default="signals.json")
+    parser.add_argument("--table", default=TABLE_PATH)
+    args = parser.parse_args()
+    if args.command == "export":
+        skipped = export_table(args.mapping, args.signals, args.table)
+        print(f"Wrote {args.table} ({skipped} mapping keys did not match {args.signals})")
+    else:
+        import_table(args.table, args.mapping)
+        print(f"Wrote {args.mapping}")
@@ -0,0 +1,261 @@
+import collections
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+NUM_SERVOS = 12
+
+# Opcodes of a compiled action program. Each mapping entry is compiled once
+# into a tuple of (opcode, operand) pairs, so dispatch never looks at the
+# task strings again.
+SLEEP = 0         # operand: delay in milliseconds
+NEXT_SERVO = 1    # operand: None
+PREV_SERVO = 2    # operand: None
+SELECT_SERVO = 3  # operand: servo number 1..NUM_SERVOS
+ADJUST_ANGLE = 4  # operand: signed angle change for the selected servo
+GESTURE = 5       # operand: gesture name for the RoninHand /execute endpoint
+NUM_OPCODES = 6
+
+Program = Tuple[Tuple[int, object], ...]
+
+# (task prefix, opcode, operand sign or None when the task takes no operand)
+_PREFIXES = [
+    ("timesleep", SLEEP, 1),
+    ("increment_servos", NEXT_SERVO, None),
+    ("decrement_servos", PREV_SERVO, None),
+    ("select_servos", SELECT_SERVO, 1),
+    ("increase_servos_angle", ADJUST_ANGLE, 1),
+    ("decrease_servos_angle", ADJUST_ANGLE, -1),
+]
+
+
+def compile_task(task) -> Tuple[int, object]:
+    if not isinstance(task, str) or not task:
+        raise ValueError(f"task {task!r} is not a non-empty string")
+    for prefix, op, sign in _PREFIXES:
+        if not task.startswith(prefix):
+            continue
+        rest = task[len(prefix):]
+        if sign is None:
+            if rest:
+                raise ValueError(f"task {task!r}: {prefix} takes no operand")
+            return op, None
+        try:
+            value = int(rest)
+        except ValueError:
+            raise ValueError(f"task {task!r}: {prefix} needs an integer operand") from None
+        if op == SLEEP and value < 0:
+            raise ValueError(f"task {task!r}: delay cannot be negative")
+        if op == SELECT_SERVO and not 1 <= value <= NUM_SERVOS:
+            raise ValueError(f"task {task!r}: servo must be between 1 and {NUM_SERVOS}")
+        return op, sign * value
+    return GESTURE, task
+
+
+def compile_program(tasks: Optional[Sequence[str]]) -> Optional[Program]:
+    # None (unassigned) stays None; raises ValueError on the first bad task
+    if tasks is None:
+        return None
+    if not isinstance(tasks, list):
+        raise ValueError(f"action program must be a list of tasks, not {type(tasks).__name__}")
+    return tuple(compile_task(task) for task in tasks)
+
+
+class ProgramCompiler:
+    # compile_program memoised per distinct task list, so a table where
+    # thousands of combinations share a program compiles it once
+    def __init__(self):
+        self._cache = {}
+
+    def __call__(self, tasks: Optional[Sequence[str]]) -> Optional[Program]:
+        if tasks is None:
+            return None
+        key = tuple(tasks) if isinstance(tasks, list) and all(isinstance(t, str) for t in tasks) else None
+        if key is None:
+            return compile_program(tasks)
+        try:
+            return self._cache[key]
+        except KeyError:
+            program = self._cache[key] = compile_program(tasks)
+            return program
+
+
+def run_program(program: Program, handlers: List[Callable[[object], None]]):
+    for op, arg in program:
+        handlers[op](arg)
+
+
+class Run:
+    # One triggered program and how far through it the scheduler has got
+    def __init__(self, program: Program):
+        self.program = program
+        self.pc = 0
+        self.cancelled = False
+        self.submitted = 0.0
+        self.done = threading.Event()
+
+
+# What ActionScheduler.start() does when the intake queue is full
+OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "block")
+
+
+class ActionScheduler:
+    # Runs programs on one worker thread. start() only appends to a bounded
+    # intake queue, so the caller never waits on the robot (unless the
+    # overflow policy is "block"). SLEEP does not block anything either: the
+    # run is parked on a monotonic deadline and the worker moves on. Steps
+    # of one run always execute in order. With preempt, admitting a program
+    # cancels every run that is still pending; an in-flight step is allowed
+    # to finish first.
+    def __init__(self, handlers: List[Callable[[object], None]], preempt: bool = True,
+                 max_queue: int = 64, overflow: str = "coalesce"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, not {overflow!r}")
+        if max_queue < 1:
+            raise ValueError("max_queue must be at least 1")
+        self.handlers = handlers
+        self.preempt = preempt
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self._cond = threading.Condition()
+        self._queue = collections.deque()
+        self._heap: List[Tuple[float, int, Run]] = []
+        self._seq = itertools.count()
+        self._active: Set[Run] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._counts = {"submitted": 0, "dispatched": 0, "dropped": 0, "coalesced": 0, "failed": 0}
+        self._max_depth = 0
+        self._lag_last = 0.0
+        self._lag_max = 0.0
+        self._lag_total = 0.0
+
+    def start(self, program: Program) -> Run:
+        run = Run(program)
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                if self.overflow == "block":
+                    while len(self._queue) >= self.max_queue and not self._closed:
+                        self._cond.wait()
+                elif self.overflow == "coalesce":
+                    self._counts["coalesced"] += len(self._queue)
+                    self._drop_locked(len(self._queue))
+                else:
+                    self._counts["dropped"] += 1
+                    self._drop_locked(1)
+            run.submitted = time.monotonic()
+            self._queue.append(run)
+            self._counts["submitted"] += 1
+            self._max_depth = max(self._max_depth, len(self._queue))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="action-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return run
+
+    def _drop_locked(self, count: int):
+        for _ in range(count):
+            run = self._queue.popleft()
+            run.cancelled = True
+            run.done.set()
+
+    def _admit_locked(self, run: Run):
+        if self.preempt:
+            self._cancel_active_locked()
+        lag = time.monotonic() - run.submitted
+        self._lag_last = lag
+        self._lag_max = max(self._lag_max, lag)
+        self._lag_total += lag
+        self._counts["dispatched"] += 1
+        self._active.add(run)
+        heapq.heappush(self._heap, (time.monotonic(), next(self._seq), run))
+
+    def _cancel_active_locked(self):
+        for run in self._active:
+            run.cancelled = True
+            run.done.set()
+        self._active.clear()
+        self._heap.clear()
+
+    def _cancel_locked(self):
+        self._drop_locked(len(self._queue))
+        self._cancel_active_locked()
+
+    def cancel_all(self):
+        with self._cond:
+            self._cancel_locked()
+            self._cond.notify_all()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._queue) + len(self._active)
+
+    def metrics(self) -> Dict[str, object]:
+        with self._cond:
+            dispatched = self._counts["dispatched"]
+            return dict(self._counts,
+                        queue_depth=len(self._queue),
+                        max_queue_depth=self._max_depth,
+                        active_runs=len(self._active),
+                        dispatch_lag_ms={"last": self._lag_last * 1e3,
+                                         "max": self._lag_max * 1e3,
+                                         "mean": self._lag_total / dispatched * 1e3 if dispatched else 0.0})
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cancel_locked()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._queue:
+                        self._admit_locked(self._queue.popleft())
+                        self._cond.notify_all()
+                        continue
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] <= now:
+                        _, _, run = heapq.heappop(self._heap)
+                        break
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+                else:
+                    return
+            self._step(run)
+
+    def _step(self, run: Run):
+        program = run.program
+        while run.pc < len(program) and not run.cancelled:
+            op, arg = program[run.pc]
+            run.pc += 1
+            if op == SLEEP:
+                with self._cond:
+                    if not run.cancelled:
+                        heapq.heappush(self._heap, (time.monotonic() + arg / 1000, next(self._seq), run))
+                return
+            try:
+                self.handlers[op](arg)
+            except Exception as e:
+                print(f"Action {program[run.pc - 1]} failed, abandoning the rest of the sequence: {e}")
+                with self._cond:
+                    self._counts["failed"] += 1
+                break
+        with self._cond:
+            self._active.discard(run)
+            run.done.set()
+            self._cond.notify_all()
@@ -0,0 +1,393 @@
+import random
+import threading
+import time
+from typing import Dict, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from actions import NUM_SERVOS
+
+ROBOT_URL = "http://localhost:8000"
+
+# STS servo control table: goal and present position are 2-byte words,
+# 0..4095 steps per turn
+STS_GOAL_POSITION = 42
+STS_PRESENT_POSITION = 56
+STS_POSITION_MAX = 4095
+
+
+class Actuator:
+    # What the bridge needs from the robot: read and write the servo
+    # positions ({"servo_N": steps}) and run a named gesture. Backends raise
+    # on failure; PositionCache and the scheduler handle the rest.
+    def current_positions(self, timeout: Optional[float] = None) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def update(self, positions: Dict[str, int], timeout: Optional[float] = None):
+        raise NotImplementedError
+
+    def execute(self, gesture: str, thumb_clearance: bool = False, timeout: Optional[float] = None):
+        raise NotImplementedError
+
+    def metrics(self) -> Dict[str, object]:
+        return {}
+
+    def close(self):
+        pass
+
+
+class HttpActuator(Actuator):
+    # Client for the RoninHand server's /current_positions, /update and
+    # /execute endpoints. Every call goes through one requests.Session with
+    # a keep-alive pool, so the control loop reuses TCP connections instead
+    # of opening one per action.
+    def __init__(self, base_url: str = ROBOT_URL, pool_size: int = 4, timeout: float = 1.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", self._adapter)
+        self.session.mount("https://", self._adapter)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._errors = 0
+
+    def _request(self, method: str, path: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        with self._lock:
+            self._calls += 1
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}",
+                                            timeout=self.timeout if timeout is None else timeout, **kwargs)
+            response.raise_for_status()
+        except requests.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+        return response
+
+    def current_positions(self, timeout: Optional[float] = None) -> Dict[str, int]:
+        return self._request("GET", "/current_positions", timeout).json()
+
+    def update(self, positions: Dict[str, int], timeout: Optional[float] = None) -> requests.Response:
+        return self._request("POST", "/update", timeout, json={"positions": positions})
+
+    def execute(self, gesture: str, thumb_clearance: bool = False, timeout: Optional[float] = None) -> requests.Response:
+        return self._request("POST", "/execute", timeout, json={"gesture": gesture, "thumb_clearance": thumb_clearance})
+
+    def metrics(self) -> Dict[str, object]:
+        # urllib3 counts requests and newly opened connections per pool;
+        # everything else was served on a reused keep-alive connection
+        connections = 0
+        pooled_requests = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                pooled_requests += pool.num_requests
+        with self._lock:
+            calls, errors = self._calls, self._errors
+        return {
+            "calls": calls,
+            "errors": errors,
+            "connections_opened": connections,
+            "connections_reused": max(pooled_requests - connections, 0),
+            "reuse_ratio": 1 - connections / pooled_requests if pooled_requests else 0.0,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+class ServoBusError(IOError):
+    pass
+
+
+class SerialActuator(Actuator):
+    # Drives the servo bus directly through scservo_sdk instead of going
+    # through the RoninHand server. update() sends every goal position in
+    # one GroupSyncWrite packet and current_positions() reads them back with
+    # one GroupSyncRead, so a whole position vector costs one bus transaction
+    # either way. servo_N is bus id servo_ids[N - 1].
+    #
+    # The bus has no gesture library of its own: execute() plays a pose from
+    # `gestures` (name -> partial position dict) as one sync write, and
+    # thumb_clearance is accepted for compatibility but ignored.
+    def __init__(self, port: str, baudrate: int = 1000000, servo_ids: Sequence[int] = range(1, NUM_SERVOS + 1),
+                 gestures: Optional[Dict[str, Dict[str, int]]] = None, protocol_end: int = 0):
+        import scservo_sdk as scs
+        self._scs = scs
+        self.port_name = port
+        self.servo_ids = list(servo_ids)
+        self.gestures = gestures or {}
+        self._port = scs.PortHandler(port)
+        self._packets = scs.PacketHandler(protocol_end)
+        if not self._port.openPort() or not self._port.setBaudRate(baudrate):
+            raise ServoBusError(f"cannot open servo bus {port} at {baudrate} baud")
+        self._writer = scs.GroupSyncWrite(self._port, self._packets, STS_GOAL_POSITION, 2)
+        self._reader = scs.GroupSyncRead(self._port, self._packets, STS_PRESENT_POSITION, 2)
+        for scs_id in self.servo_ids:
+            self._reader.addParam(scs_id)
+        # the scheduler worker and the position flusher share one half-duplex bus
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "errors": 0, "sync_writes": 0, "sync_reads": 0, "bytes_written": 0}
+
+    def _check(self, result: int, what: str):
+        if result != self._scs.COMM_SUCCESS:
+            self._counts["errors"] += 1
+            raise ServoBusError(f"{what} on {self.port_name} failed: {self._packets.getTxRxResult(result)}")
+
+    def current_positions(self, timeout: Optional[float] = None) -> Dict[str, int]:
+        # timeout is fixed by the SDK from the packet length
+        with self._lock:
+            self._counts["calls"] += 1
+            self._check(self._reader.txRxPacket(), "sync read")
+            self._counts["sync_reads"] += 1
+            return {f"servo_{n}": self._reader.getData(scs_id, STS_PRESENT_POSITION, 2)
+                    for n, scs_id in enumerate(self.servo_ids, 1)}
+
+    def update(self, positions: Dict[str, int], timeout: Optional[float] = None):
+        scs = self._scs
+        with self._lock:
+            self._counts["calls"] += 1
+            self._writer.clearParam()
+            for n, scs_id in enumerate(self.servo_ids, 1):
+                position = positions.get(f"servo_{n}")
+                if position is None:
+                    continue
+                position = min(max(int(position), 0), STS_POSITION_MAX)
+                self._writer.addParam(scs_id, [scs.SCS_LOBYTE(position), scs.SCS_HIBYTE(position)])
+            if not self._writer.data_dict:
+                return
+            self._check(self._writer.txPacket(), "sync write")
+            self._counts["sync_writes"] += 1
+            # two header bytes, id, length, instruction, address, data length, checksum
+            self._counts["bytes_written"] += 8 + len(self._writer.data_dict) * 3
+
+    def execute(self, gesture: str, thumb_clearance: bool = False, timeout: Optional[float] = None):
+        pose = self.gestures.get(gesture)
+        if pose is None:
+            with self._lock:
+                self._counts["errors"] += 1
+            raise ServoBusError(f"no pose for gesture {gesture!r} on the serial backend")
+        self.update(pose)
+
+    def metrics(self) -> Dict[str, object]:
+        with self._lock:
+            return dict(self._counts)
+
+    def close(self):
+        with self._lock:
+            self._port.closePort()
+
+
+class SimulatedActuator(Actuator):
+    # In-process stand-in for the RoninHand server, for load-testing the
+    # bridge without the robot. Keeps the servo positions in memory and
+    # answers every call after `latency` plus a uniform 0..`jitter` seconds.
+    # A call whose delay exceeds its timeout raises TimeoutError after the
+    # timeout, like the HTTP client would. Gestures with a pose in
+    # `gestures` move the servos; any other gesture name is accepted as is.
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, timeout: float = 1.0,
+                 gestures: Optional[Dict[str, Dict[str, int]]] = None, position: int = 2048,
+                 seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.timeout = timeout
+        self.gestures = gestures or {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._positions = {f"servo_{n}": position for n in range(1, NUM_SERVOS + 1)}
+        self._counts = {"current_positions": 0, "update": 0, "execute": 0, "timeouts": 0}
+        self._delay_total = 0.0
+        self._delay_max = 0.0
+
+    def _respond(self, call: str, timeout: Optional[float]):
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            self._counts[call] += 1
+            self._delay_total += delay
+            self._delay_max = max(self._delay_max, delay)
+        timeout = self.timeout if timeout is None else timeout
+        if delay > timeout:
+            time.sleep(timeout)
+            with self._lock:
+                self._counts["timeouts"] += 1
+            raise TimeoutError(f"simulated {call} took longer than {timeout}s")
+        if delay:
+            time.sleep(delay)
+
+    def current_positions(self, timeout: Optional[float] = None) -> Dict[str, int]:
+        self._respond("current_positions", timeout)
+        with self._lock:
+            return dict(self._positions)
+
+    def update(self, positions: Dict[str, int], timeout: Optional[float] = None):
+        self._respond("update", timeout)
+        with self._lock:
+            self._positions.update(positions)
+
+    def execute(self, gesture: str, thumb_clearance: bool = False, timeout: Optional[float] = None):
+        self._respond("execute", timeout)
+        with self._lock:
+            self._positions.update(self.gestures.get(gesture, {}))
+
+    def positions(self) -> Dict[str, int]:
+        # the simulated hand's state, without a simulated call
+        with self._lock:
+            return dict(self._positions)
+
+    def metrics(self) -> Dict[str, object]:
+        with self._lock:
+            calls = self._counts["current_positions"] + self._counts["update"] + self._counts["execute"]
+            return dict(self._counts,
+                        delay_ms={"mean": self._delay_total / calls * 1e3 if calls else 0.0,
+                                  "max": self._delay_max * 1e3})
+
+
+class PositionCache:
+    # Local model of the servo positions. Adjustments are applied to the
+    # model and written through with a single /update of the whole vector;
+    # the robot is only read back on first use, after a failed write, after
+    # invalidate() (a gesture moved the hand) or once reconcile_interval has
+    # passed. Overlapping adjustments fold into the same pending target, so
+    # none of them is lost.
+    #
+    # With a tick, stage() only updates the pending target and a flusher
+    # thread sends it at most once per tick, latest value wins: a sequence
+    # that walks all twelve servos costs one /update instead of twelve.
+    def __init__(self, actuator, reconcile_interval: float = 5.0, tick: float = 0.0):
+        self.actuator = actuator
+        self.reconcile_interval = reconcile_interval
+        self.tick = tick
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._write_lock = threading.Lock()
+        self._positions: Optional[Dict[str, int]] = None
+        self._pending: Optional[Dict[str, int]] = None
+        self._inflight = False
+        self._synced = 0.0
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+        self._counts = {"adjustments": 0, "reads": 0, "writes": 0, "write_errors": 0}
+
+    def _stale_locked(self) -> bool:
+        if self._positions is None:
+            return True
+        return bool(self.reconcile_interval) and time.monotonic() - self._synced > self.reconcile_interval
+
+    def _sync_locked(self):
+        self._positions = dict(self.actuator.current_positions())
+        self._synced = time.monotonic()
+        self._counts["reads"] += 1
+
+    def _fresh_locked(self) -> Dict[str, int]:
+        # the model, re-read first if stale, but never while an /update is
+        # in flight: the read could return positions from before it
+        while self._stale_locked():
+            if self._inflight:
+                self._cond.wait()
+            else:
+                self._sync_locked()
+        return self._positions
+
+    def _stage_locked(self, servo: int, delta: int) -> Dict[str, int]:
+        if self._pending is None:
+            positions = self._fresh_locked()
+            # another stage may have started a target while we waited
+            if self._pending is None:
+                self._pending = dict(positions)
+        self._pending[f"servo_{servo}"] += delta
+        self._counts["adjustments"] += 1
+        return dict(self._pending)
+
+    def positions(self) -> Dict[str, int]:
+        with self._lock:
+            if self._pending is not None:
+                return dict(self._pending)
+            positions = self._fresh_locked()
+            return dict(self._pending if self._pending is not None else positions)
+
+    def adjust(self, servo: int, delta: int) -> Dict[str, int]:
+        # stage and write now
+        with self._lock:
+            target = self._stage_locked(servo, delta)
+        self.flush()
+        return target
+
+    def stage(self, servo: int, delta: int) -> Dict[str, int]:
+        # stage for the next tick; without a tick this is adjust()
+        if not self.tick:
+            return self.adjust(servo, delta)
+        with self._lock:
+            target = self._stage_locked(servo, delta)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="servo-flusher", daemon=True)
+                self._flusher.start()
+            self._cond.notify_all()
+        return target
+
+    def flush(self):
+        # Write the pending target, if any, as one /update. The model is
+        # advanced before the write so stages made meanwhile build on it.
+        with self._write_lock:
+            with self._lock:
+                target = self._pending
+                if target is None:
+                    return
+                self._pending = None
+                self._positions = target
+                self._inflight = True
+            try:
+                self.actuator.update(target)
+            except Exception:
+                with self._lock:
+                    # the robot may or may not have moved; re-read before trusting the model
+                    self._positions = None
+                    self._counts["write_errors"] += 1
+                raise
+            finally:
+                with self._lock:
+                    self._inflight = False
+                    self._cond.notify_all()
+            with self._lock:
+                self._counts["writes"] += 1
+
+    def _flush_loop(self):
+        while True:
+            with self._lock:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            time.sleep(self.tick)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Servo position update failed: {e}")
+
+    def wait_flushed(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self._pending is not None or self._inflight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def invalidate(self):
+        with self._lock:
+            self._positions = None
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
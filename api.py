@@ -1,85 +1,475 @@
 import json
+import os
 import http.server
-import socketserver
+import threading
 import time
 from scservo_sdk import *
-import itertools
-import fnmatch
-import copy
+import functools
 import ast
-import requests
-
-signal_received={}
-signal_received_time={}
-old_signal_received_time={}
-servos=1
-SERVER_URL = "http://localhost:8000"
-def change_servos_position(servos,adjustment):
-    current_positions = requests.get(f"{SERVER_URL}/current_positions", timeout=1).json() 
-    print(current_positions)
-    current_positions[f"servo_{servos}"]+=adjustment
-    response=requests.post(f"{SERVER_URL}/update", json={"positions": current_positions},timeout=1)
-    print(f"The response to updating the postion was {response}") 
-
-def convert_signal_to_action(signal_received):
-    print(f"The signal received was {signal_received}")
-    lst = list(signal_received.values())
-    with open("mapping.json", "r") as file:
-        data = json.load(file)
-    tasks=data[str(lst)]
-
-    global servos
-    for task in tasks:
-        if task[:9]=="timesleep":
-            time.sleep(int(task[9:])*1000)
-        elif task[:16]=="increment_servos":
-            servos+=1
-            if servos>12:
-                servos=1
-        elif task[:16]=="decrement_servos":
-            servos-=1
-            if servos<1:
-                servos=12
-        elif task[:13]=="select_servos":
-            servos=int(task[13:])
-        elif task[:21]=="increase_servos_angle":
-            adjustment=int(task[21:])
-            change_servos_position(servos,adjustment)
-        elif task[:21]=="decrease_servos_angle":
-            adjustment=int(task[21:])
-            change_servos_position(servos,adjustment)
-        else:
-            response = requests.post(f"{SERVER_URL}/execute", 
-                        json={"gesture": task, "thumb_clearance": False},
-                        timeout=1) 
+from mapping_store import MappingJournal, MappingTable, SparseMapping, compact_journal, iter_json
+from action_table import ActionTable
+import actions
+from actuators import HttpActuator, PositionCache, SerialActuator, SimulatedActuator
+from api_server import CachedResponse, ThreadPoolServer
+from debounce import DebounceEngine, EdgeTrigger, load_config
+from signal_codec import SchemaCache
+from state_store import StateStore
+from signal_stream import StreamServer
+from signal_udp import DatagramServer
+
+# live signal state is kept per sender (see DeviceSession), debounced per
+# signal (see debounce.py); DEBOUNCE_CONFIG holds the per-signal settings
+DEBOUNCE_CONFIG = os.getenv("DEBOUNCE_CONFIG", "debounce.json")
+# DISPATCH_MODE=level (default) acts on every evaluation, including the
+# repeats of an unchanged combination; DISPATCH_MODE=edge only acts when the
+# combination differs from the last one acted on, or DISPATCH_REARM_MS
+# after it (0 never repeats it)
+DISPATCH_MODE = os.getenv("DISPATCH_MODE", "level")
+if DISPATCH_MODE not in ("level", "edge"):
+    raise ValueError(f"DISPATCH_MODE must be level or edge, not {DISPATCH_MODE!r}")
+DISPATCH_REARM = float(os.getenv("DISPATCH_REARM_MS", "0"))/1000
+# requests are served on several threads: each DeviceSession has its own
+# lock, mapping_lock serialises the writers of mapping_table and
+# signals.json. Lookups read what mapping_table last published and
+# signals.json is replaced atomically, so evaluation takes neither.
+mapping_lock = threading.Lock()
+SERVER_URL = os.getenv("ROBOT_URL", "http://localhost:8000")
+# "dense" keeps every combination in mapping.json, "sparse" keeps only the
+# assigned combinations and wildcard rules in mapping.rules.json, "table"
+# keeps every combination in the memory-mapped binary mapping.bin
+MAPPING_MODE = os.getenv("MAPPING_MODE", "dense")
+# In dense and sparse mode /add_mapping appends to <mapping file>.journal
+# rather than rewriting the mapping file (MAPPING_JOURNAL=0 rewrites it
+# every time). A background thread folds the journal back into the file
+# once it holds MAPPING_COMPACT_BYTES or its oldest entry is
+# MAPPING_COMPACT_SECONDS old (0 = size only). table mode writes in place.
+MAPPING_JOURNAL = os.getenv("MAPPING_JOURNAL", "1") != "0"
+MAPPING_COMPACT_BYTES = int(os.getenv("MAPPING_COMPACT_BYTES", str(1 << 20)))
+MAPPING_COMPACT_SECONDS = float(os.getenv("MAPPING_COMPACT_SECONDS", "30"))
+# how often a background thread checks the mapping files for changes made
+# by other processes; this process's own writes are seen at once
+MAPPING_RECHECK = float(os.getenv("MAPPING_RECHECK_MS", "1000"))/1000
+
+def make_journal(path):
+    if not MAPPING_JOURNAL:
+        return None
+    return MappingJournal(path, max_bytes=MAPPING_COMPACT_BYTES, max_age=MAPPING_COMPACT_SECONDS)
+
+compiler = actions.ProgramCompiler()
+if MAPPING_MODE == "sparse":
+    mapping_table = SparseMapping("mapping.rules.json", "signals.json", compiler=compiler,
+                                  journal=make_journal("mapping.rules.json"))
+elif MAPPING_MODE == "table":
+    # recheck_mapping() paces the checks for outside changes
+    mapping_table = ActionTable("mapping.bin", compiler=compiler, check_interval=0)
+else:
+    mapping_table = MappingTable("mapping.json", compiler=compiler, journal=make_journal("mapping.json"))
+mapping_journal = getattr(mapping_table, "journal", None)
+with mapping_lock:
+    mapping_table.refresh()  # replays whatever a crash left in the journal
+# ROBOT_BACKEND=http (default) goes through one keep-alive connection pool
+# to the RoninHand server; ROBOT_BACKEND=serial drives the servo bus on
+# ROBOT_SERIAL_PORT directly; ROBOT_BACKEND=sim answers in-process after
+# ROBOT_SIM_LATENCY_MS plus up to ROBOT_SIM_JITTER_MS. Gesture poses for
+# serial and sim come from ROBOT_GESTURES.
+ROBOT_BACKEND = os.getenv("ROBOT_BACKEND", "http")
+gestures = {}
+if os.getenv("ROBOT_GESTURES"):
+    with open(os.getenv("ROBOT_GESTURES"), "r") as file:
+        gestures = json.load(file)
+
+def make_robot(route):
+    # route overrides the ROBOT_* settings, see ROBOT_ROUTES
+    backend = route.get("backend", ROBOT_BACKEND)
+    if backend == "serial":
+        return SerialActuator(route.get("serial_port", os.getenv("ROBOT_SERIAL_PORT", "/dev/ttyUSB0")),
+                              baudrate=int(route.get("baudrate", os.getenv("ROBOT_BAUDRATE", "1000000"))),
+                              gestures=gestures)
+    elif backend == "sim":
+        return SimulatedActuator(latency=float(route.get("latency_ms", os.getenv("ROBOT_SIM_LATENCY_MS", "0")))/1000,
+                                 jitter=float(route.get("jitter_ms", os.getenv("ROBOT_SIM_JITTER_MS", "0")))/1000,
+                                 timeout=float(os.getenv("ROBOT_TIMEOUT", "1.0")),
+                                 gestures=gestures)
+    elif backend == "http":
+        return HttpActuator(route.get("url", SERVER_URL),
+                            pool_size=int(os.getenv("ROBOT_POOL_SIZE", "4")),
+                            timeout=float(os.getenv("ROBOT_TIMEOUT", "1.0")))
+    raise ValueError(f"ROBOT_BACKEND must be http, serial or sim, not {backend!r}")
+
+# servo positions are tracked locally and written through, at most one
+# /update per ROBOT_UPDATE_TICK_MS (0 writes every adjustment immediately);
+# ROBOT_RECONCILE_SECONDS=0 disables the periodic re-read
+def make_position_cache(robot):
+    return PositionCache(robot,
+                         reconcile_interval=float(os.getenv("ROBOT_RECONCILE_SECONDS", "5")),
+                         tick=float(os.getenv("ROBOT_UPDATE_TICK_MS", "15"))/1000)
+
+robot = make_robot({})
+servo_positions = make_position_cache(robot)
+# ROBOT_ROUTES is a JSON file giving some senders their own robot, e.g.
+# {"glove-b": {"backend": "http", "url": "http://hand-b:8000"}}; the
+# others share the one above
+ROBOT_ROUTES = {}
+if os.getenv("ROBOT_ROUTES"):
+    with open(os.getenv("ROBOT_ROUTES"), "r") as file:
+        ROBOT_ROUTES = json.load(file)
+
+def change_servos_position(session,servos,adjustment):
+    positions = session.positions.stage(servos,adjustment)
+    print(f"Moving servo_{servos} to {positions[f'servo_{servos}']}")
+
+def do_next_servo(session,_):
+    session.servos+=1
+    if session.servos>actions.NUM_SERVOS:
+        session.servos=1
 
-    pass
+def do_prev_servo(session,_):
+    session.servos-=1
+    if session.servos<1:
+        session.servos=actions.NUM_SERVOS
 
+def do_select_servo(session,servo):
+    session.servos=servo
 
-def match_pattern(pattern_str, data_list_strs):
-    # Convert the pattern string to a Python list
-    pattern = ast.literal_eval(pattern_str)
-    results = []
+def do_adjust_angle(session,adjustment):
+    change_servos_position(session,session.servos,adjustment)
 
-    for item_str in data_list_strs:
-        lst = ast.literal_eval(item_str)  # Convert stored string to list
-        if len(lst) != len(pattern):
+def do_gesture(session,gesture):
+    # staged servo moves go out before the gesture, not after it
+    session.positions.flush()
+    response = session.robot.execute(gesture)
+    # the gesture moved the hand outside our position model
+    session.positions.invalidate()
+
+def action_handlers(session):
+    # indexed by opcode
+    handlers = [None]*actions.NUM_OPCODES
+    handlers[actions.NEXT_SERVO] = functools.partial(do_next_servo, session)
+    handlers[actions.PREV_SERVO] = functools.partial(do_prev_servo, session)
+    handlers[actions.SELECT_SERVO] = functools.partial(do_select_servo, session)
+    handlers[actions.ADJUST_ANGLE] = functools.partial(do_adjust_angle, session)
+    handlers[actions.GESTURE] = functools.partial(do_gesture, session)
+    return handlers
+
+# timesleep is handled by the scheduler itself. ACTION_PREEMPT=0 lets a new
+# gesture run alongside pending ones instead of cancelling them.
+# ACTION_OVERFLOW is drop_oldest, coalesce or block when ACTION_QUEUE_SIZE
+# triggers are already waiting for the worker.
+def make_scheduler(session):
+    return actions.ActionScheduler(action_handlers(session),
+                                   preempt=os.getenv("ACTION_PREEMPT", "1") != "0",
+                                   max_queue=int(os.getenv("ACTION_QUEUE_SIZE", "64")),
+                                   overflow=os.getenv("ACTION_OVERFLOW", "coalesce"))
+
+class DeviceSession:
+    # Everything live about one sender: its debounce engine, dispatch gate,
+    # counters, published signal state, selected servo and action scheduler,
+    # and the robot it drives. lock guards the first three and serialises
+    # publishing; store snapshots are read without it. servos is only
+    # touched by the action handlers, which run on the session's scheduler
+    # thread. Senders never wait on each other's lock, and one sender's
+    # gesture does not preempt another's.
+    def __init__(self, device, robot, positions):
+        self.device = device
+        self.lock = threading.Lock()
+        self.signal_state = None
+        self.store = None
+        self.edge_trigger = EdgeTrigger(DISPATCH_REARM) if DISPATCH_MODE == "edge" else None
+        # frames, signal updates and batches taken in, how often the mapping
+        # was evaluated and how many evaluations were acted on or suppressed
+        # by DISPATCH_MODE=edge
+        self.ingest = {"frames": 0, "signals": 0, "batches": 0, "evaluations": 0, "dispatched": 0, "suppressed": 0}
+        self.servos = 1
+        self.robot = robot
+        self.positions = positions
+        self.scheduler = make_scheduler(self)
+        # when the sender last sent a frame; closed once evicted as idle
+        self.last_seen = time.monotonic()
+        self.closed = False
+
+    def close(self):
+        # after eviction: stop the scheduler and, if routed, the own robot
+        self.scheduler.close()
+        if self.robot is not robot:
+            self.positions.close()
+            self.robot.close()
+
+    def reset(self):
+        # after /add_signal or /remove_signal; the next sample starts over
+        with self.lock:
+            self.signal_state = None
+            self.store = None
+            if self.edge_trigger is not None:
+                self.edge_trigger.reset()
+
+    def metrics(self):
+        with self.lock:
+            metrics = {"ingest": dict(self.ingest),
+                       "debounce": self.signal_state.metrics() if self.signal_state is not None else None}
+        metrics["servo"] = self.servos
+        metrics["dispatch"] = self.scheduler.metrics()
+        if self.robot is not robot:
+            metrics["robot"] = self.robot.metrics()
+        return metrics
+
+# senders without an id share DEFAULT_DEVICE. A session is created on a
+# sender's first sample and looked up without a lock after that;
+# sessions_lock is only taken to create or evict one. API_MAX_SESSIONS
+# bounds how many there are. A session that has not sent anything for
+# API_SESSION_IDLE_SECONDS is closed (0 keeps every session); it is
+# recreated, starting over, if its sender comes back.
+DEFAULT_DEVICE = "default"
+API_MAX_SESSIONS = int(os.getenv("API_MAX_SESSIONS", "64"))
+API_SESSION_IDLE = float(os.getenv("API_SESSION_IDLE_SECONDS", "300"))
+default_session = DeviceSession(DEFAULT_DEVICE, robot, servo_positions)
+scheduler = default_session.scheduler
+sessions = {DEFAULT_DEVICE: default_session}
+sessions_lock = threading.Lock()
+
+def evict_idle_locked():
+    # with sessions_lock held; returns the evicted sessions for close_sessions
+    if not API_SESSION_IDLE:
+        return []
+    evicted = []
+    for device, session in list(sessions.items()):
+        if session is default_session:
             continue
-        # Match each element
-        match = all(p == "*" or p == v for p, v in zip(pattern, lst))
-        if match:
-            results.append(item_str)  # Keep original string form if you want
-    return results
+        with session.lock:
+            if time.monotonic() - session.last_seen < API_SESSION_IDLE:
+                continue
+            session.closed = True
+        del sessions[device]
+        evicted.append(session)
+    return evicted
+
+def close_sessions(evicted):
+    # outside sessions_lock: closing waits for a running action to stop
+    for session in evicted:
+        session.close()
+        print(f"Closed idle sender session {session.device!r}")
+
+def evict_idle_sessions():
+    # background: close idle sessions even when no new sender needs the room
+    while True:
+        time.sleep(min(API_SESSION_IDLE, 60))
+        with sessions_lock:
+            evicted = evict_idle_locked()
+        close_sessions(evicted)
+
+def session_for(device):
+    session = sessions.get(device)
+    if session is not None:
+        return session
+    evicted = []
+    try:
+        with sessions_lock:
+            session = sessions.get(device)
+            if session is None:
+                if len(sessions) >= API_MAX_SESSIONS:
+                    evicted = evict_idle_locked()
+                if len(sessions) >= API_MAX_SESSIONS:
+                    raise ValueError(f"too many senders, API_MAX_SESSIONS is {API_MAX_SESSIONS}")
+                route = ROBOT_ROUTES.get(device)
+                if route is not None:
+                    session_robot = make_robot(route)
+                    session = DeviceSession(device, session_robot, make_position_cache(session_robot))
+                else:
+                    session = DeviceSession(device, robot, servo_positions)
+                sessions[device] = session
+                print(f"New sender session {device!r}")
+    finally:
+        close_sessions(evicted)
+    return session
+
+def receive_signal(signal, value, device=DEFAULT_DEVICE):
+    # signal/value are one name and state or a whole frame as parallel
+    # lists; a frame is applied under the sender's lock and evaluated once,
+    # so the mapping never sees half of it
+    if isinstance(signal, str):
+        signal, value = [signal], [value]
+    if len(signal) != len(value):
+        raise ValueError(f"{len(signal)} signals but {len(value)} values")
+    session = session_for(device)
+    with session.lock:
+        if not session.closed:
+            session.last_seen = time.monotonic()
+            apply_frame(session, signal, value)
+            return
+    # evicted as idle between the lookup and the lock; start a new session
+    receive_signal(signal, value, device)
+
+def apply_frame(session, signal, value):
+    # with session.lock held
+    if session.signal_state is None:
+        names = list(load_signals())
+        session.signal_state = DebounceEngine(names, load_config(DEBOUNCE_CONFIG))
+        session.store = StateStore(names)
+    state = session.signal_state
+    store = session.store
+    session.ingest["frames"]+=1
+    session.ingest["signals"]+=len(signal)
+    ready = state.update_frame(signal, value)
+    # the debounced state of the signals in this frame, published as one
+    # snapshot; evaluation acts on that snapshot
+    snapshot = store.publish([(store.index[name], state.accepted(name)) for name in signal if name in store.index])
+    if ready:
+        session.ingest["evaluations"]+=1
+        state.evaluated()
+        if session.edge_trigger is not None and not session.edge_trigger.allow(snapshot.values, time.monotonic()):
+            session.ingest["suppressed"]+=1
+            return
+        session.ingest["dispatched"]+=1
+        convert_signal_to_action(dict(zip(store.names, snapshot.values)), session)
+
+def reset_signal_state():
+    for session in list(sessions.values()):
+        session.reset()
+
+def receive_frames(frames, device=DEFAULT_DEVICE):
+    # catch-up after a sender lost its connection: frames carry the sender's
+    # time "t" and are folded in that order into one frame holding the
+    # latest state of each signal, which is applied and evaluated once
+    if not isinstance(frames, list) or not all(isinstance(frame, dict) for frame in frames):
+        raise TypeError("frames must be a list of objects")
+    latest = {}
+    for frame in sorted(frames, key=lambda frame: frame.get("t", 0)):
+        signal, value = frame["signal"], frame["value"]
+        if isinstance(signal, str):
+            signal, value = [signal], [value]
+        if len(signal) != len(value):
+            raise ValueError(f"{len(signal)} signals but {len(value)} values")
+        latest.update(zip(signal, value))
+    session = session_for(device)
+    with session.lock:
+        session.ingest["batches"]+=1
+    if latest:
+        receive_signal(list(latest), list(latest.values()), device)
+
+def receive_frame(frame):
+    # a frame from the signal stream or a datagram carries the /receive_signals
+    # body, "device" naming the sender's session
+    if not isinstance(frame, dict):
+        raise TypeError("a frame must be an object")
+    device = str(frame.get("device", DEFAULT_DEVICE))
+    if "frames" in frame:
+        receive_frames(frame["frames"], device)
+    else:
+        receive_signal(frame['signal'], frame['value'], device)
+
+def load_signals():
+    with open("signals.json", "r") as file:
+        return json.load(file)
+
+def save_signals(signals):
+    # with mapping_lock held; readers see the old file or the new one
+    with open("signals.json.tmp", "w") as file:
+        json.dump(signals, file, indent=4)
+    os.replace("signals.json.tmp", "signals.json")
+
+def build_signals_response():
+    return json.dumps(load_signals()).encode()
+
+def build_schema_response():
+    return json.dumps(signal_schema.get().describe()).encode()
+
+def build_mapping_response():
+    with mapping_lock:
+        return b"".join(iter_json(mapping_table.view()))
+
+# GET /signals and /mapping are served from memory and only re-serialised
+# after a write or when the files change on disk; clients revalidate with
+# If-None-Match and get a 304 while nothing changed
+signals_response = CachedResponse(build_signals_response, ["signals.json"])
+# binary signal frames index into this (see signal_codec.py); GET /schema
+# hands it to senders
+signal_schema = SchemaCache(load_signals, ["signals.json"])
+schema_response = CachedResponse(build_schema_response, ["signals.json"])
+mapping_response = CachedResponse(build_mapping_response, [mapping_table.path, "signals.json"])
+
+def collect_state():
+    # GET /state: every session's latest snapshot, read without any lock
+    state = {}
+    for device, session in list(sessions.items()):
+        store = session.store
+        state[device] = store.as_dict() if store is not None else None
+    return state
+
+def collect_metrics():
+    per_session = {device: session.metrics() for device, session in list(sessions.items())}
+    ingest = {}
+    for metrics in per_session.values():
+        for key, count in metrics["ingest"].items():
+            ingest[key] = ingest.get(key, 0) + count
+    return {"ingest": ingest, "sessions": per_session, "dispatch": scheduler.metrics(), "robot": robot.metrics(),
+            "positions": servo_positions.metrics(),
+            "responses": {"signals": signals_response.metrics(), "mapping": mapping_response.metrics(),
+                          "schema": schema_response.metrics()},
+            "stream": stream_server.metrics() if stream_server is not None else None,
+            "udp": udp_server.metrics() if udp_server is not None else None,
+            "journal": mapping_journal.metrics() if mapping_journal is not None else None}
+
+def recheck_mapping():
+    # background: pick up mapping and signals files changed by other processes
+    while True:
+        time.sleep(MAPPING_RECHECK)
+        try:
+            with mapping_lock:
+                mapping_table.refresh()
+        except (OSError, ValueError) as e:
+            print(f"Mapping recheck failed: {e}")
+
+def compact_mapping():
+    # background: fold the mapping journal into the mapping file once due
+    while True:
+        time.sleep(min(MAPPING_COMPACT_SECONDS, 1) if MAPPING_COMPACT_SECONDS > 0 else 1)
+        try:
+            compact_journal(mapping_table, mapping_lock)
+        except OSError as e:
+            print(f"Mapping journal compaction failed: {e}")
+
+def convert_signal_to_action(signal_received, session=default_session):
+    print(f"The signal received was {signal_received}")
+    program = mapping_table.lookup_program(tuple(signal_received.values()))
+    if not program:
+        return
+    session.scheduler.start(program)
+
+
+# HTTP/1.1 keep-alive: a connection is closed after API_IDLE_TIMEOUT
+# seconds without a request or after API_MAX_REQUESTS_PER_CONNECTION
+# requests. Every open connection holds one of the API_WORKERS threads
+# while it lasts. API_KEEPALIVE=0 answers HTTP/1.0 and closes after every
+# request.
+API_KEEPALIVE = os.getenv("API_KEEPALIVE", "1") != "0"
+API_IDLE_TIMEOUT = float(os.getenv("API_IDLE_TIMEOUT", "2"))
+API_MAX_REQUESTS_PER_CONNECTION = int(os.getenv("API_MAX_REQUESTS_PER_CONNECTION", "1000"))
 
 class GestureHandler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" if API_KEEPALIVE else "HTTP/1.0"
+    timeout = API_IDLE_TIMEOUT
+    # headers and body go out as separate writes; without this, Nagle plus
+    # delayed ACKs add ~40 ms to every keep-alive response
+    disable_nagle_algorithm = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+    def setup(self):
+        super().setup()
+        self.requests_handled = 0
+
+    def handle_one_request(self):
+        super().handle_one_request()
+        self.requests_handled += 1
+
     def end_headers(self):
         # Add CORS headers to allow cross-origin requests
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        if (self.protocol_version == "HTTP/1.1" and not self.close_connection
+                and self.requests_handled + 1 >= API_MAX_REQUESTS_PER_CONNECTION):
+            self.send_header('Connection', 'close')
         super().end_headers()
 
     def do_OPTIONS(self):
@@ -88,36 +478,57 @@ class GestureHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Content-Length', '0')
         self.end_headers()
 
+    def send_cached(self, response):
+        body, etag = response.get()
+        if response.not_modified(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
     def do_GET(self):
         if self.path == '/':
+            body = json.dumps({"message": "API Server Running"}).encode()
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
             self.end_headers()
-            self.wfile.write(json.dumps({"message": "API Server Running"}).encode())
-        elif self.path == '/signals': #tested works
-            print("Handling GET /signals")
-            with open("signals.json", "r") as file:
-                data = json.load(file)
+            self.wfile.write(body)
+        elif self.path == '/metrics':
+            body = json.dumps(collect_metrics()).encode()
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-            self.send_header('Pragma', 'no-cache')
-            self.send_header('Expires', '0')
+            self.send_header('Content-Length', str(len(body)))
             self.end_headers()
-            self.wfile.write(json.dumps(data).encode())
-        elif self.path == '/mapping': #tested works
-            print("Handling GET /mapping")
-            with open("mapping.json", "r") as file:
-                data = json.load(file)
+            self.wfile.write(body)
+        elif self.path == '/state':
+            body = json.dumps(collect_state()).encode()
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
-            self.send_header('Pragma', 'no-cache')
-            self.send_header('Expires', '0')
+            self.send_header('Content-Length', str(len(body)))
             self.end_headers()
-            self.wfile.write(json.dumps(data).encode())
+            self.wfile.write(body)
+        elif self.path == '/signals': #tested works
+            print("Handling GET /signals")
+            self.send_cached(signals_response)
+        elif self.path == '/schema':
+            self.send_cached(schema_response)
+        elif self.path == '/mapping': #tested works
+            print("Handling GET /mapping")
+            self.send_cached(mapping_response)
         else:
             super().do_GET()
 
@@ -131,107 +542,148 @@ class GestureHandler(http.server.SimpleHTTPRequestHandler):
         if self.path == '/add_signal': #testedworks
             signal_name = data['signal']
             signal_types=data["signal_types"]
-            with open("signals.json", "r") as file:
-                data = json.load(file)
-            data[signal_name]=signal_types
-            signal_mapping={}
-            value_lists = list(data.values())
-            combinations = itertools.product(*value_lists)
-            results = [list(combo) for combo in combinations]
-            for i in results:
-                signal_mapping[str(i)]=None
-            with open("mapping.json", "w") as file:
-                json.dump(signal_mapping, file, indent=4) 
-            with open("signals.json", "w") as file:
-                json.dump(data, file, indent=4)
+            with mapping_lock:
+                with open("signals.json", "r") as file:
+                    data = json.load(file)
+                old_signals = dict(data)
+                data[signal_name]=signal_types
+                save_signals(data)
+                conflicts = mapping_table.migrate(old_signals, data)
+            signals_response.invalidate()
+            signal_schema.invalidate()
+            schema_response.invalidate()
+            mapping_response.invalidate()
+            reset_signal_state()
+            if conflicts:
+                print(f"Mapping migration dropped {len(conflicts)} rules: {conflicts}")
             end_time=time.time()
             print(f"Update request handled in {end_time-start_time:.2f} ms")
+            body = json.dumps({"conflicts": conflicts}).encode()
             self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
             self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
             self.send_header('Pragma', 'no-cache')
             self.send_header('Expires', '0')
+            self.send_header('Content-Length', str(len(body)))
             self.end_headers()
+            self.wfile.write(body)
         elif self.path == '/remove_signal':
             signal_name = data['signal']
-            with open("signals.json", "r") as file:
-                data = json.load(file)
-            del data[signal_name]
-            signal_mapping={}
-            value_lists = list(data.values())
-            combinations = itertools.product(*value_lists)
-            results = [list(combo) for combo in combinations]
-            for i in results:
-                signal_mapping[str(i)]=None
-            with open("mapping.json", "w") as file:
-                json.dump(signal_mapping, file, indent=4) 
-            with open("signals.json", "w") as file:
-                json.dump(data, file, indent=4)
+            with mapping_lock:
+                with open("signals.json", "r") as file:
+                    data = json.load(file)
+                old_signals = dict(data)
+                del data[signal_name]
+                save_signals(data)
+                conflicts = mapping_table.migrate(old_signals, data)
+            signals_response.invalidate()
+            signal_schema.invalidate()
+            schema_response.invalidate()
+            mapping_response.invalidate()
+            reset_signal_state()
+            if conflicts:
+                print(f"Mapping migration dropped {len(conflicts)} rules: {conflicts}")
             end_time=time.time()
             print(f"Update request handled in {end_time-start_time:.2f} ms")
+            body = json.dumps({"conflicts": conflicts}).encode()
             self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
             self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
             self.send_header('Pragma', 'no-cache')
             self.send_header('Expires', '0')
+            self.send_header('Content-Length', str(len(body)))
             self.end_headers()
+            self.wfile.write(body)
         elif self.path == '/add_mapping':
             signal = data['signal']
             mapsto=data["mapsto"]
-            with open("mapping.json", "r") as file:
-                data = json.load(file)
-            matches = match_pattern(signal,data.keys())
-            for i in matches:
-                data[i]=mapsto
-            with open("mapping.json", "w") as file:
-                json.dump(data, file, indent=4)
+            try:
+                actions.compile_program(mapsto)
+            except ValueError as e:
+                body = json.dumps({"error": str(e)}).encode()
+                self.send_response(400)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            pattern = ast.literal_eval(signal)
+            with mapping_lock:
+                matched = mapping_table.assign(pattern, mapsto)
+            mapping_response.invalidate()
+            print(f"Pattern {signal} matched {matched} combinations")
             end_time=time.time()
             print(f"Update request handled in {end_time-start_time:.2f} ms")
             self.send_response(200)
             self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
             self.send_header('Pragma', 'no-cache')
             self.send_header('Expires', '0')
+            self.send_header('Content-Length', '0')
             self.end_headers()
         elif self.path == '/receive_signals':
-            signal = data['signal']
-            value=data["value"]
-            global signal_received,old_signal_received_time,signal_received_time
-            if not signal_received:
-                with open("signals.json", "r") as file:
-                    data = json.load(file)
-                for i in data:
-                    signal_received[i]=None
-                    old_signal_received_time[i]=100
-            signal_received[signal]=value
-            signal_received_time[signal]=time.time()
-            proceed=True
-            for key, value in signal_received.items():
-                if value==None:
-                    proceed=False
-                    break
-            for key in signal_received_time:
-                if signal_received_time[key]-old_signal_received_time[key]<1:
-                    proceed=False
-                    break
-            if proceed:
-                convert_signal_to_action(signal_received)
-                old_signal_received_time=copy.deepcopy(signal_received_time)
+            try:
+                if isinstance(data, dict) and 'device' not in data and self.headers.get('X-Device-Id'):
+                    data['device'] = self.headers['X-Device-Id']
+                receive_frame(data)
+            except (KeyError, TypeError, ValueError) as e:
+                body = json.dumps({"error": str(e)}).encode()
+                self.send_response(400)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
             end_time=time.time()
             print(f"Update request handled in {end_time-start_time:.2f} ms")
             self.send_response(200)
             self.send_header('Cache-Control', 'no-cache, no-store, must-revalidate')
             self.send_header('Pragma', 'no-cache')
             self.send_header('Expires', '0')
+            self.send_header('Content-Length', '0')
             self.end_headers()
+        else:
+            self.send_error(404)
 
 
-import http.server
-import socketserver
-
 PORT = 7001  # Or any port you want
+# API_WORKERS connections are served concurrently; 0 serves one at a time
+API_WORKERS = int(os.getenv("API_WORKERS", "16"))
+# Senders can also keep one connection open on STREAM_PORT and push
+# length-prefixed frames (see signal_stream.py); STREAM_PORT=0 turns it off.
+# STREAM_WINDOW frames may be in flight before the sender has to wait.
+STREAM_PORT = int(os.getenv("STREAM_PORT", "7003"))
+stream_server = None
+if STREAM_PORT:
+    stream_server = StreamServer(("", STREAM_PORT), receive_frame, window=int(os.getenv("STREAM_WINDOW", "64")),
+                                 schema=signal_schema.get)
+    threading.Thread(target=stream_server.serve_forever, name="signal-stream", daemon=True).start()
+    print(f"Signal stream listening on port {STREAM_PORT}")
+# UDP_PORT accepts one frame per datagram (see signal_udp.py), off unless set.
+# Frames sent more than UDP_MAX_AGE_MS ago by the sender's clock are dropped;
+# 0 keeps only the ordering check, for senders whose clock is not in sync.
+UDP_PORT = int(os.getenv("UDP_PORT", "0"))
+udp_server = None
+if UDP_PORT:
+    udp_server = DatagramServer(("", UDP_PORT), receive_frame, max_age=float(os.getenv("UDP_MAX_AGE_MS", "200")) / 1000,
+                                schema=signal_schema.get)
+    threading.Thread(target=udp_server.serve_forever, name="signal-udp", daemon=True).start()
+    print(f"Signal datagrams accepted on UDP port {UDP_PORT}")
+
+if API_SESSION_IDLE:
+    threading.Thread(target=evict_idle_sessions, name="session-evictor", daemon=True).start()
+
+if MAPPING_RECHECK > 0:
+    threading.Thread(target=recheck_mapping, name="mapping-recheck", daemon=True).start()
+if mapping_journal is not None:
+    if mapping_journal.pending:
+        print(f"Replayed {mapping_journal.pending} journalled mapping edits")
+    threading.Thread(target=compact_mapping, name="mapping-compactor", daemon=True).start()
 
-with socketserver.TCPServer(("", PORT), GestureHandler) as httpd:
+with ThreadPoolServer(("", PORT), GestureHandler, workers=API_WORKERS) as httpd:
     print(f"Server running at http://localhost:{PORT}")
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\nReceived Ctrl+C, shutting down")
         httpd.shutdown()
+        compact_journal(mapping_table, mapping_lock, force=True)
@@ -0,0 +1,99 @@
+import hashlib
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Sequence, Tuple
+
+from mapping_store import file_stamp
+
+
+class ThreadPoolServer(socketserver.TCPServer):
+    # TCPServer that hands each accepted connection to a fixed pool of
+    # worker threads, so one slow request no longer holds up every other
+    # client. At most `workers` connections are served at once and at most
+    # `max_pending` more wait for a worker; beyond that the accept loop
+    # stops and new connections queue in the kernel backlog. With
+    # workers=0 requests are served one at a time on the accept loop, like
+    # a plain TCPServer.
+    allow_reuse_address = True
+    request_queue_size = 64
+
+    def __init__(self, address, handler, workers: int = 8, max_pending: Optional[int] = None):
+        # set before TCPServer.__init__, which calls server_close() when the
+        # bind fails
+        self._pool = None
+        self._slots = None
+        super().__init__(address, handler)
+        self.workers = workers
+        if workers > 0:
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-worker")
+            self._slots = threading.BoundedSemaphore(workers + (workers * 4 if max_pending is None else max_pending))
+
+    def process_request(self, request, client_address):
+        if self._pool is None:
+            return super().process_request(request, client_address)
+        self._slots.acquire()
+        try:
+            self._pool.submit(self._serve, request, client_address)
+        except RuntimeError:
+            # pool already shut down
+            self._slots.release()
+            self.shutdown_request(request)
+
+    def _serve(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def server_close(self):
+        super().server_close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class CachedResponse:
+    # A response body kept serialised in memory with a strong ETag (a hash
+    # of the bytes). build() runs again only after invalidate() or when one
+    # of `paths` changes on disk. Call invalidate() after releasing any lock
+    # that build() takes.
+    def __init__(self, build: Callable[[], bytes], paths: Sequence[str] = ()):
+        self.build = build
+        self.paths = list(paths)
+        self._lock = threading.Lock()
+        self._body: Optional[bytes] = None
+        self._etag = ""
+        self._stamps = None
+        self._counts = {"builds": 0, "not_modified": 0}
+
+    def get(self) -> Tuple[bytes, str]:
+        stamps = tuple(file_stamp(path) for path in self.paths)
+        with self._lock:
+            if self._body is None or stamps != self._stamps:
+                self._body = self.build()
+                self._etag = '"' + hashlib.blake2b(self._body, digest_size=16).hexdigest() + '"'
+                self._stamps = stamps
+                self._counts["builds"] += 1
+            return self._body, self._etag
+
+    def not_modified(self, if_none_match: Optional[str], etag: str) -> bool:
+        # If-None-Match uses the weak comparison, so W/"x" matches "x"
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in tags or etag in tags or "W/" + etag in tags:
+            with self._lock:
+                self._counts["not_modified"] += 1
+            return True
+        return False
+
+    def invalidate(self):
+        with self._lock:
+            self._body = None
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._counts)
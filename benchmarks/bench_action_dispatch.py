@@ -0,0 +1,85 @@
+# Per-action dispatch cost: the old string-prefix if/elif chain with int()
+# parsing on every trigger vs a precompiled (opcode, operand) program run
+# through the handler table. Handlers are no-ops so only dispatch is timed.
+#
+#   python benchmarks/bench_action_dispatch.py
+import bench_util  # noqa: F401  (puts the repo root on sys.path)
+from bench_util import time_per_call
+import actions
+
+servos = 1
+
+
+def noop(*args):
+    pass
+
+
+def prefix_dispatch(tasks):
+    global servos
+    for task in tasks:
+        if task[:9] == "timesleep":
+            noop(int(task[9:]) * 1000)
+        elif task[:16] == "increment_servos":
+            servos += 1
+            if servos > 12:
+                servos = 1
+        elif task[:16] == "decrement_servos":
+            servos -= 1
+            if servos < 1:
+                servos = 12
+        elif task[:13] == "select_servos":
+            servos = int(task[13:])
+        elif task[:21] == "increase_servos_angle":
+            noop(servos, int(task[21:]))
+        elif task[:21] == "decrease_servos_angle":
+            noop(servos, int(task[21:]))
+        else:
+            noop(task)
+
+
+def next_servo(_):
+    global servos
+    servos += 1
+    if servos > 12:
+        servos = 1
+
+
+def prev_servo(_):
+    global servos
+    servos -= 1
+    if servos < 1:
+        servos = 12
+
+
+def select_servo(servo):
+    global servos
+    servos = servo
+
+
+HANDLERS = [None] * actions.NUM_OPCODES
+HANDLERS[actions.SLEEP] = noop
+HANDLERS[actions.NEXT_SERVO] = next_servo
+HANDLERS[actions.PREV_SERVO] = prev_servo
+HANDLERS[actions.SELECT_SERVO] = select_servo
+HANDLERS[actions.ADJUST_ANGLE] = noop
+HANDLERS[actions.GESTURE] = noop
+
+SEQUENCES = {
+    "gesture": ["fist"],
+    "servo walk": ["select_servos1"] + ["increase_servos_angle10", "increment_servos"] * 12,
+    "mixed": ["select_servos3", "increase_servos_angle15", "timesleep0", "decrement_servos",
+              "decrease_servos_angle5", "open", "increment_servos", "increase_servos_angle20"],
+}
+
+
+def run():
+    print(f"{'sequence':>12} {'actions':>8} {'prefix chain':>16} {'compiled':>12} {'speedup':>8}")
+    for label, tasks in SEQUENCES.items():
+        program = actions.compile_program(tasks)
+        old = time_per_call(lambda: prefix_dispatch(tasks), max_calls=10 ** 6) / len(tasks)
+        new = time_per_call(lambda: actions.run_program(program, HANDLERS), max_calls=10 ** 6) / len(tasks)
+        print(f"{label:>12} {len(tasks):>8} {old * 1e9:>13.0f} ns {new * 1e9:>9.0f} ns {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run()
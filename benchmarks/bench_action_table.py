@@ -0,0 +1,66 @@
+# Binary memory-mapped action table (mapping.bin) vs the compiled JSON
+# MappingTable: startup time, per-trigger lookup latency and resident
+# memory. Each store is measured in a fresh child process so RSS is not
+# shared between runs.
+#
+#   python benchmarks/bench_action_table.py [max_bits]
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_util import fmt_us, make_mapping, make_signals, time_per_call, write_json
+
+
+def rss_kb():
+    with open("/proc/self/status") as file:
+        for line in file:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def child(kind, directory):
+    from action_table import ActionTable
+    from mapping_store import MappingTable
+
+    with open(os.path.join(directory, "signals.json")) as file:
+        signals = json.load(file)
+    combos = [tuple(random.choice(v) for v in signals.values()) for _ in range(1000)]
+    it = iter(combos * 1000)
+    before = rss_kb()
+    start = time.perf_counter()
+    if kind == "json":
+        store = MappingTable(os.path.join(directory, "mapping.json"))
+    else:
+        store = ActionTable(os.path.join(directory, "mapping.bin"))
+    store.refresh()
+    load = time.perf_counter() - start
+    lookup = time_per_call(lambda: store.lookup(next(it)))
+    print(json.dumps({"load": load, "lookup": lookup, "rss": rss_kb() - before}))
+
+
+def run(max_bits=20):
+    from action_table import export_table
+
+    print(f"{'entries':>10} {'store':>6} {'startup':>12} {'lookup':>15} {'rss':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for bits in range(8, max_bits + 1, 4):
+            signals = make_signals(bits)
+            write_json(os.path.join(tmp, "signals.json"), signals)
+            write_json(os.path.join(tmp, "mapping.json"), make_mapping(signals))
+            export_table(os.path.join(tmp, "mapping.json"), os.path.join(tmp, "signals.json"), os.path.join(tmp, "mapping.bin"))
+            for kind in ("json", "table"):
+                out = subprocess.run([sys.executable, __file__, "--child", kind, tmp], capture_output=True, text=True, check=True)
+                r = json.loads(out.stdout)
+                print(f"{2 ** bits:>10} {kind:>6} {r['load'] * 1e3:>9.1f} ms {fmt_us(r['lookup'])} {r['rss']:>9} kB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3])
+    else:
+        run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,111 @@
+# api.py under mixed load: sensor senders POSTing /receive_signals while
+# UI pollers GET /signals and /mapping, served one request at a time
+# (API_WORKERS=0) vs by the worker pool. Reports p50/p99 per endpoint.
+# The pollers sit behind a slow link (their request arrives in two parts
+# LINK_DELAY_MS apart), as a browser on Wi-Fi would. Uses the simulated
+# robot backend; needs port 7001 free.
+#
+#   python benchmarks/bench_api_concurrency.py [n_signals] [senders] [pollers] [seconds]
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from bench_util import make_signals, percentile, start_api, write_json
+
+URL = "http://localhost:7001"
+SENDER_RATE = 50   # POST /receive_signals per second per sender
+POLLER_RATE = 5    # GET /signals + GET /mapping per second per poller
+LINK_DELAY_MS = 20
+
+
+def slow_get(path):
+    with socket.create_connection(("localhost", 7001)) as sock:
+        sock.sendall(f"GET {path} HTTP/1.1\r\n".encode())
+        time.sleep(LINK_DELAY_MS / 1000)
+        sock.sendall(b"Host: localhost\r\nConnection: close\r\n\r\n")
+        while sock.recv(65536):
+            pass
+
+
+def paced(rate, seconds, fn, results):
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    next_at = start + random.random() * interval
+    while time.perf_counter() - start < seconds:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        fn(results)
+        next_at += interval
+
+
+def timed(results, label, call):
+    t = time.perf_counter()
+    call()
+    results.setdefault(label, []).append(time.perf_counter() - t)
+
+
+def load(workers, signals, senders, pollers, seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        write_json(f"{directory}/signals.json", {})
+        write_json(f"{directory}/mapping.json", {})
+        server = start_api(directory, API_WORKERS=str(workers), ROBOT_BACKEND="sim", ROBOT_SIM_LATENCY_MS="2")
+        try:
+            for name, states in signals.items():
+                requests.post(URL + "/add_signal", json={"signal": name, "signal_types": states}, timeout=30)
+            requests.post(URL + "/add_mapping", json={"signal": str(["*"] * len(signals)),
+                                                      "mapsto": ["select_servos1", "increase_servos_angle1"]}, timeout=30)
+            names = list(signals)
+
+            def send(results):
+                name = random.choice(names)
+                timed(results, "POST /receive_signals",
+                      lambda: requests.post(URL + "/receive_signals",
+                                            json={"signal": name, "value": random.choice(signals[name])}, timeout=30))
+
+            def poll(results):
+                timed(results, "GET /signals", lambda: slow_get("/signals"))
+                timed(results, "GET /mapping", lambda: slow_get("/mapping"))
+
+            results = [{} for _ in range(senders + pollers)]
+            threads = [threading.Thread(target=paced, args=(SENDER_RATE, seconds, send, results[i]))
+                       for i in range(senders)]
+            threads += [threading.Thread(target=paced, args=(POLLER_RATE, seconds, poll, results[senders + i]))
+                        for i in range(pollers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            server.terminate()
+            server.wait()
+    merged = {}
+    for result in results:
+        for label, latencies in result.items():
+            merged.setdefault(label, []).extend(latencies)
+    return merged
+
+
+def run(n_signals=10, senders=4, pollers=2, seconds=5.0):
+    signals = make_signals(n_signals)
+    print(f"{2 ** n_signals} mapping entries, {senders} senders x {SENDER_RATE}/s, "
+          f"{pollers} pollers x {POLLER_RATE}/s behind a {LINK_DELAY_MS} ms link, {seconds:.0f}s")
+    print(f"{'workers':>8} {'endpoint':>22} {'requests':>9} {'p50':>10} {'p99':>10}")
+    for workers in (0, 8):
+        merged = load(workers, signals, senders, pollers, seconds)
+        for label in ("POST /receive_signals", "GET /signals", "GET /mapping"):
+            latencies = merged[label]
+            print(f"{workers:>8} {label:>22} {len(latencies):>9} {percentile(latencies, 0.5) * 1e3:>7.2f} ms "
+                  f"{percentile(latencies, 0.99) * 1e3:>7.2f} ms")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 2,
+        float(sys.argv[4]) if len(sys.argv) > 4 else 5.0)
@@ -0,0 +1,162 @@
+# Virtual-clock harness for the /receive_signals gate: the original global
+# one-second gate (every signal re-sent a second after the last trigger,
+# then a deepcopy of the timestamps) vs debounce.DebounceEngine.
+#   reaction   time from a true change of a signal to the first evaluation
+#              that sees the new combination
+#   spurious   evaluations of a combination that was never the true one,
+#              i.e. an EMG glitch got through
+#   cost       wall time per sample, with 7 signals and with many
+# Five glove fingers change cleanly; the bicep EMG channel chatters for
+# 30 ms around each change and has single-sample glitches. No server is
+# started; everything runs on a virtual clock.
+#
+#   python benchmarks/bench_debounce.py [seconds] [rate]
+import copy
+import random
+import sys
+import time
+
+from bench_util import percentile
+
+from debounce import DebounceEngine
+
+SIGNALS = {f"finger{i}": [f"{i}flexed", f"{i}notflexed"] for i in range(1, 6)}
+SIGNALS.update({"bicep": ["true", "false"], "mode": ["0", "1", "2"]})
+CONFIG = {"default": {"window_ms": 0, "min_hold_ms": 0, "confirm": 1},
+          "signals": {"bicep": {"window_ms": 40, "min_hold_ms": 200, "confirm": 3}}}
+
+
+class LegacyGate:
+    # receive_signal before the debounce engine, on a virtual clock
+    def __init__(self, names):
+        self.received = {name: None for name in names}
+        self.received_time = {}
+        # 100 in the original, i.e. long before time.time()
+        self.old_time = {name: float("-inf") for name in names}
+
+    def update(self, signal, value, now):
+        self.received[signal] = value
+        self.received_time[signal] = now
+        for v in self.received.values():
+            if v is None:
+                return None
+        for key in self.received_time:
+            if self.received_time[key] - self.old_time[key] < 1:
+                return None
+        self.old_time = copy.deepcopy(self.received_time)
+        return tuple(self.received.values())
+
+
+class Engine:
+    def __init__(self, names, config):
+        self.engine = DebounceEngine(names, config, clock=lambda: 0.0)
+
+    def update(self, signal, value, now):
+        if self.engine.update(signal, value, now):
+            self.engine.evaluated(now)
+            return self.engine.combination()
+        return None
+
+
+def scenario(seconds, rate, seed=0):
+    # [(time, signal, sampled value)] and the true state changes per signal
+    rng = random.Random(seed)
+    names = list(SIGNALS)
+    truth = {name: [(0.0, SIGNALS[name][0])] for name in names}
+    for name in names:
+        t = 0.0
+        while True:
+            t += rng.uniform(0.5, 3.0)
+            if t >= seconds:
+                break
+            states = [s for s in SIGNALS[name] if s != truth[name][-1][1]]
+            truth[name].append((t, rng.choice(states)))
+    samples = []
+    step = 1.0 / rate
+    for name in names:
+        changes = truth[name]
+        k = 0
+        n = 0
+        while n * step < seconds:
+            t = n * step + rng.uniform(0, step / 2)
+            while k + 1 < len(changes) and changes[k + 1][0] <= t:
+                k += 1
+            value = changes[k][1]
+            if name == "bicep":
+                near = [c for c in changes[max(k - 1, 0):k + 2] if c[0] > 0 and abs(c[0] - t) < 0.015]
+                if near and rng.random() < 0.5:
+                    value = [s for s in SIGNALS[name] if s != value][0]
+                elif rng.random() < 0.02:
+                    value = [s for s in SIGNALS[name] if s != value][0]
+            samples.append((t, name, value))
+            n += 1
+    samples.sort()
+    return samples, truth
+
+
+def true_at(truth, name, t):
+    value = truth[name][0][1]
+    for at, state in truth[name]:
+        if at > t:
+            break
+        value = state
+    return value
+
+
+def judge(gate, samples, truth):
+    names = list(SIGNALS)
+    evaluations = []
+    for t, name, value in samples:
+        combination = gate.update(name, value, t)
+        if combination is not None:
+            evaluations.append((t, combination))
+    # changes are at least 0.5 s apart, so a state that was true neither now
+    # nor 0.3 s ago (a fair debounce delay) can only come from a glitch
+    spurious = sum(1 for t, combination in evaluations
+                   if any(combination[i] not in (true_at(truth, name, t), true_at(truth, name, t - 0.3))
+                          for i, name in enumerate(names)))
+    reactions = []
+    for i, name in enumerate(names):
+        for at, state in truth[name][1:]:
+            seen = next((t for t, combination in evaluations if t >= at and combination[i] == state), None)
+            if seen is not None:
+                reactions.append(seen - at)
+    return evaluations, reactions, spurious
+
+
+def cost(make, names, samples):
+    gate = make(names)
+    start = time.perf_counter()
+    for t, name, value in samples:
+        gate.update(name, value, t)
+    return (time.perf_counter() - start) / len(samples)
+
+
+def run(seconds=120.0, rate=100):
+    samples, truth = scenario(seconds, rate)
+    names = list(SIGNALS)
+    print(f"{len(names)} signals at {rate} Hz for {seconds:.0f}s virtual, "
+          f"{sum(len(c) - 1 for c in truth.values())} true changes")
+    print(f"{'gate':>8} {'evals':>7} {'react p50':>11} {'react p99':>11} {'react max':>11} {'spurious':>9} {'missed':>7}")
+    changes = sum(len(c) - 1 for c in truth.values())
+    for label, gate in (("legacy", LegacyGate(names)), ("debounce", Engine(names, CONFIG))):
+        evaluations, reactions, spurious = judge(gate, samples, truth)
+        print(f"{label:>8} {len(evaluations):>7} {percentile(reactions, 0.5) * 1e3:>8.0f} ms "
+              f"{percentile(reactions, 0.99) * 1e3:>8.0f} ms {max(reactions) * 1e3:>8.0f} ms {spurious:>9} "
+              f"{changes - len(reactions):>7}")
+
+    print("\ncost per sample")
+    for n_signals in (len(names), 200):
+        wide = names + [f"extra{i}" for i in range(n_signals - len(names))]
+        extra = list(samples)
+        for i in range(n_signals - len(names)):
+            extra += [(t + 1e-6 * i, f"extra{i}", "0") for t in range(int(seconds))]
+        extra.sort()
+        legacy = cost(LegacyGate, wide, extra)
+        engine = cost(lambda names: Engine(names, CONFIG), wide, extra)
+        print(f"{n_signals:>5} signals: legacy {legacy * 1e6:>7.2f} us   debounce {engine * 1e6:>7.2f} us")
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 120.0,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100)
@@ -0,0 +1,72 @@
+# Level vs edge-triggered dispatch in api.py. A glove-like sender posts
+# 7-signal frames at `rate` Hz while the user holds still, changing one
+# signal every `hold` seconds; every combination is mapped to a gesture.
+# Reports evaluations, dispatched/suppressed counts and the gestures the
+# (simulated) robot actually executed.
+#   level        DISPATCH_MODE=level, the repeat gate re-runs the held
+#                combination about once a second
+#   edge         DISPATCH_MODE=edge, only changes are dispatched
+#   edge+rearm   DISPATCH_MODE=edge with DISPATCH_REARM_MS=2000
+# Needs port 7001 free.
+#
+#   python benchmarks/bench_edge_dispatch.py [seconds] [rate] [hold]
+import itertools
+import random
+import sys
+import tempfile
+import time
+
+import requests
+
+from bench_util import start_api, write_json
+
+URL = "http://localhost:7001"
+SIGNALS = {f"finger{i}": [f"{i}flexed", f"{i}notflexed"] for i in range(1, 6)}
+SIGNALS.update({"bicep": ["true", "false"], "mode": ["0", "1", "2"]})
+
+
+def run(seconds=12.0, rate=20, hold=3.0):
+    names = list(SIGNALS)
+    mapping = {str(list(combo)): ["fist"] for combo in itertools.product(*SIGNALS.values())}
+    print(f"{len(names)} signals at {rate} Hz for {seconds:.0f}s, one change every {hold:.0f}s")
+    print(f"{'mode':>11} {'changes':>8} {'evals':>6} {'dispatched':>11} {'suppressed':>11} {'gestures':>9}")
+    for label, env in (("level", {"DISPATCH_MODE": "level"}),
+                       ("edge", {"DISPATCH_MODE": "edge"}),
+                       ("edge+rearm", {"DISPATCH_MODE": "edge", "DISPATCH_REARM_MS": "2000"})):
+        rng = random.Random(0)
+        with tempfile.TemporaryDirectory() as directory:
+            write_json(f"{directory}/signals.json", SIGNALS)
+            write_json(f"{directory}/mapping.json", mapping)
+            server = start_api(directory, ROBOT_BACKEND="sim", **env)
+            try:
+                session = requests.Session()
+                values = [states[0] for states in SIGNALS.values()]
+                start = time.perf_counter()
+                next_change = hold
+                changes = 0
+                n = 0
+                while time.perf_counter() - start < seconds:
+                    if time.perf_counter() - start >= next_change:
+                        i = rng.randrange(len(names))
+                        values[i] = rng.choice([s for s in SIGNALS[names[i]] if s != values[i]])
+                        next_change += hold
+                        changes += 1
+                    session.post(URL + "/receive_signals", json={"signal": names, "value": values}, timeout=5)
+                    n += 1
+                    delay = start + n / rate - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                time.sleep(0.2)
+                metrics = session.get(URL + "/metrics", timeout=5).json()
+                ingest = metrics["ingest"]
+                print(f"{label:>11} {changes:>8} {ingest['evaluations']:>6} {ingest['dispatched']:>11} "
+                      f"{ingest['suppressed']:>11} {metrics['robot']['execute']:>9}")
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 12.0,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 3.0)
@@ -0,0 +1,88 @@
+# Whole-frame updates on POST /receive_signals for the 7-signal frame
+# hardware/data_read.py sends, one sender as fast as it can:
+#   per-signal  one POST per signal, 7 per frame
+#   frame       one POST with parallel signal/value lists per frame
+#   batch       one POST of `batch` timestamped frames ({"frames": [...]}),
+#               as a sender catching up after a hiccup would send
+# Frames alternate between every signal in its first state and every signal
+# in its second state, and only the mixed combinations are mapped to a
+# gesture, so a gesture on the (simulated) robot means the mapping was
+# evaluated on half of one frame and half of the next.
+# Uses the simulated robot backend; needs port 7001 free.
+#
+#   python benchmarks/bench_frame_updates.py [seconds] [batch]
+import itertools
+import sys
+import tempfile
+import time
+
+import requests
+
+from bench_util import start_api, write_json
+
+URL = "http://localhost:7001"
+SIGNALS = {f"finger{i}": [f"{i}flexed", f"{i}notflexed"] for i in range(1, 6)}
+SIGNALS.update({"bicep": ["true", "false"], "mode": ["0", "1"]})
+NAMES = list(SIGNALS)
+
+
+def frame(n):
+    return [states[n % 2] for states in SIGNALS.values()]
+
+
+def mapping():
+    table = {}
+    for combo in itertools.product(*SIGNALS.values()):
+        uniform = list(combo) in (frame(0), frame(1))
+        table[str(list(combo))] = None if uniform else ["fist"]
+    return table
+
+
+def send_per_signal(session, n):
+    for name, value in zip(NAMES, frame(n)):
+        session.post(URL + "/receive_signals", json={"signal": name, "value": value}, timeout=5)
+    return 1, len(NAMES)
+
+
+def send_frame(session, n):
+    session.post(URL + "/receive_signals", json={"signal": NAMES, "value": frame(n)}, timeout=5)
+    return 1, 1
+
+
+def send_batch(batch):
+    def send(session, n):
+        frames = [{"signal": NAMES, "value": frame(n + k), "t": time.time()} for k in range(batch)]
+        session.post(URL + "/receive_signals", json={"frames": frames}, timeout=5)
+        return batch, 1
+    return send
+
+
+def run(seconds=4.0, batch=50):
+    print(f"one sender for {seconds:.0f}s, {len(NAMES)}-signal frames")
+    print(f"{'':>10} {'frames/s':>10} {'requests':>10} {'lock+eval':>10} {'triggers':>9} {'half-frame':>11}")
+    for label, send in (("per-signal", send_per_signal), ("frame", send_frame), ("batch", send_batch(batch))):
+        with tempfile.TemporaryDirectory() as directory:
+            write_json(f"{directory}/signals.json", SIGNALS)
+            write_json(f"{directory}/mapping.json", mapping())
+            server = start_api(directory, ROBOT_BACKEND="sim")
+            try:
+                session = requests.Session()
+                start = time.perf_counter()
+                frames = requests_sent = 0
+                while time.perf_counter() - start < seconds:
+                    sent, posts = send(session, frames)
+                    frames += sent
+                    requests_sent += posts
+                elapsed = time.perf_counter() - start
+                metrics = session.get(URL + "/metrics", timeout=5).json()
+                ingest = metrics["ingest"]
+                print(f"{label:>10} {frames / elapsed:>10.0f} {requests_sent:>10} {ingest['frames']:>10} "
+                      f"{ingest['evaluations']:>9} {metrics['robot']['execute']:>11}")
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 4.0,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50)
@@ -0,0 +1,53 @@
+# Requests per second from a single /receive_signals sender (like
+# hardware/data_read.py), new connection per POST against the HTTP/1.0
+# server (API_KEEPALIVE=0) vs one persistent connection against the
+# HTTP/1.1 server. Uses the simulated robot backend; needs port 7001 free.
+#
+#   python benchmarks/bench_keepalive.py [requests]
+import sys
+import tempfile
+import time
+
+import requests
+
+from bench_util import percentile, start_api, write_json
+
+URL = "http://localhost:7001"
+PAYLOAD = {"signal": "bicep", "value": "true"}
+
+
+def measure(post, count):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(count):
+        t = time.perf_counter()
+        response = post(URL + "/receive_signals", json=PAYLOAD, timeout=5)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - t)
+    return count / (time.perf_counter() - start), latencies
+
+
+def run(count=2000):
+    print(f"{count} sequential POST /receive_signals from one client")
+    print(f"{'mode':>12} {'req/s':>8} {'p50':>10} {'p99':>10}")
+    for label, keepalive in (("per-request", "0"), ("keep-alive", "1")):
+        with tempfile.TemporaryDirectory() as directory:
+            write_json(f"{directory}/signals.json", {"bicep": ["true", "false"]})
+            write_json(f"{directory}/mapping.json", {"['true']": None, "['false']": None})
+            server = start_api(directory, API_KEEPALIVE=keepalive, ROBOT_BACKEND="sim")
+            try:
+                if keepalive == "1":
+                    session = requests.Session()
+                    rate, latencies = measure(session.post, count)
+                    session.close()
+                else:
+                    rate, latencies = measure(requests.post, count)
+            finally:
+                server.terminate()
+                server.wait()
+        print(f"{label:>12} {rate:>8.0f} {percentile(latencies, 0.5) * 1e3:>7.2f} ms "
+              f"{percentile(latencies, 0.99) * 1e3:>7.2f} ms")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,95 @@
+# 10k sequential /add_mapping edits against the mapping store, the way a
+# provisioning script sends them:
+#   rewrite   every assign() rewrites the whole mapping file (MAPPING_JOURNAL=0)
+#   journal   every assign() appends one line to the journal; compactions
+#             run inline whenever one is due, so their cost is included
+# Edits are single combinations or patterns with one or two wildcards.
+# Also reports the time to recover the table from file + journal after a
+# crash, i.e. without a final compaction. Rewrite runs stop after
+# `budget` seconds and are extrapolated (marked *).
+#
+#   python benchmarks/bench_mapping_journal.py [edits] [budget]
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from bench_util import make_mapping, make_signals, percentile, write_json
+from mapping_store import MappingJournal, MappingTable, SparseMapping, compact_journal
+
+LOCK = threading.Lock()
+
+
+def make_edits(signals, n, seed=0):
+    rng = random.Random(seed)
+    names = list(signals)
+    edits = []
+    for i in range(n):
+        pattern = [rng.choice(states) for states in signals.values()]
+        for pos in rng.sample(range(len(names)), rng.choice((0, 1, 2))):
+            pattern[pos] = "*"
+        edits.append((pattern, None if rng.random() < 0.1 else [f"gesture{i % 50}"]))
+    return edits
+
+
+def make_table(mode, directory, journal):
+    path = os.path.join(directory, "mapping.json" if mode == "dense" else "mapping.rules.json")
+    journal = MappingJournal(path) if journal else None
+    if mode == "dense":
+        return MappingTable(path, journal=journal)
+    return SparseMapping(path, os.path.join(directory, "signals.json"), journal=journal)
+
+
+def edit(mode, signals, edits, journal, budget):
+    with tempfile.TemporaryDirectory() as directory:
+        write_json(os.path.join(directory, "signals.json"), signals)
+        if mode == "dense":
+            write_json(os.path.join(directory, "mapping.json"), make_mapping(signals, assign_every=10 ** 9))
+        table = make_table(mode, directory, journal)
+        table.refresh()
+        latencies = []
+        start = time.perf_counter()
+        for pattern, tasks in edits:
+            t = time.perf_counter()
+            with LOCK:
+                table.assign(pattern, tasks)
+            if journal:
+                compact_journal(table, LOCK)
+            latencies.append(time.perf_counter() - t)
+            if time.perf_counter() - start > budget:
+                break
+        elapsed = time.perf_counter() - start
+        recovery = None
+        if journal:
+            table.journal.close()
+            view = list(table.view())
+            t = time.perf_counter()
+            recovered = make_table(mode, directory, True)
+            recovered.refresh()
+            recovery = time.perf_counter() - t
+            assert list(recovered.view()) == view
+            recovered.journal.close()
+        compactions = table.journal.metrics()["compactions"] if journal else 0
+        return elapsed * len(edits) / len(latencies), len(latencies) < len(edits), latencies, compactions, recovery
+
+
+def run(n_edits=10000, budget=20.0):
+    print(f"{n_edits} sequential edits")
+    print(f"{'mode':>7} {'entries':>8} {'store':>8} {'total':>10} {'p50':>10} {'p99':>10} {'compactions':>12} {'recovery':>10}")
+    for mode in ("dense", "sparse"):
+        for bits in (6, 10, 14):
+            signals = make_signals(bits)
+            edits = make_edits(signals, n_edits)
+            for journal in (False, True):
+                total, projected, latencies, compactions, recovery = edit(mode, signals, edits, journal, budget)
+                print(f"{mode:>7} {2 ** bits:>8} {'journal' if journal else 'rewrite':>8} "
+                      f"{total:>8.2f} s{'*' if projected else ' '}"
+                      f"{percentile(latencies, 0.5) * 1e3:>7.3f} ms {percentile(latencies, 0.99) * 1e3:>7.3f} ms "
+                      f"{compactions:>12} " + (f"{recovery * 1e3:>7.1f} ms" if recovery is not None else f"{'-':>10}"))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 20.0)
@@ -0,0 +1,42 @@
+# Per-trigger mapping lookup latency: re-parsing mapping.json (old
+# convert_signal_to_action path) vs the compiled in-memory MappingTable.
+#
+#   python benchmarks/bench_mapping_lookup.py [max_bits]
+import json
+import os
+import random
+import sys
+import tempfile
+
+from bench_util import fmt_us, make_mapping, make_signals, time_per_call, write_json
+from mapping_store import MappingTable
+
+
+def reparse_lookup(path, states):
+    with open(path, "r") as file:
+        data = json.load(file)
+    return data[str(list(states))]
+
+
+def run(max_bits=20):
+    print(f"{'entries':>10} {'re-parse':>15} {'compiled':>15} {'speedup':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "mapping.json")
+        for bits in range(8, max_bits + 1, 2):
+            signals = make_signals(bits)
+            write_json(path, make_mapping(signals))
+            combos = [tuple(random.choice(v) for v in signals.values()) for _ in range(1000)]
+
+            it = iter(combos * 1000)
+            old = time_per_call(lambda: reparse_lookup(path, next(it)), min_time=1.0, max_calls=200)
+
+            table = MappingTable(path)
+            table.refresh()
+            it = iter(combos * 1000)
+            new = time_per_call(lambda: table.lookup(next(it)), min_time=0.5, max_calls=500000)
+
+            print(f"{2 ** bits:>10} {fmt_us(old)} {fmt_us(new)} {old / new:>9.0f}x")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
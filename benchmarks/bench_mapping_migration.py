@@ -0,0 +1,54 @@
+# Cost of /add_signal and /remove_signal mapping migration as the number of
+# assigned rules and signals grows, sparse vs dense stores. "stored" is
+# the number of rules (sparse) or combinations (dense) after migration.
+#
+#   python benchmarks/bench_mapping_migration.py [max_signals]
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bench_util import make_signals, write_json
+from mapping_store import MappingTable, SparseMapping
+
+
+def seed_rules(store, signals, n_rules):
+    names = list(signals.values())
+    for i in range(n_rules):
+        pattern = [random.choice(v) if random.random() < 0.5 else "*" for v in names]
+        store.assign(pattern, [f"gesture{i}"])
+
+
+def timed_migrate(store, old, new):
+    start = time.perf_counter()
+    conflicts = store.migrate(old, new)
+    return time.perf_counter() - start, len(conflicts)
+
+
+def run(max_signals=14):
+    print(f"{'signals':>8} {'rules':>6} {'store':>7} {'add_signal':>12} {'remove':>12} {'conflicts':>10} {'stored':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        signals_path = os.path.join(tmp, "signals.json")
+        for n in range(6, max_signals + 1, 4):
+            signals = make_signals(n)
+            grown = dict(signals, extra=["x0", "x1"])
+            for n_rules in (10, 100, 1000):
+                stores = {
+                    "dense": MappingTable(os.path.join(tmp, "mapping.json")),
+                    "sparse": SparseMapping(os.path.join(tmp, "mapping.rules.json"), signals_path),
+                }
+                for label, store in stores.items():
+                    write_json(signals_path, signals)
+                    store.reset(signals)
+                    random.seed(n_rules)
+                    seed_rules(store, signals, n_rules)
+                    write_json(signals_path, grown)
+                    add, _ = timed_migrate(store, signals, grown)
+                    write_json(signals_path, signals)
+                    remove, conflicts = timed_migrate(store, grown, signals)
+                    print(f"{n:>8} {n_rules:>6} {label:>7} {add * 1e3:>9.2f} ms {remove * 1e3:>9.2f} ms {conflicts:>10} {len(store):>8}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 14)
@@ -0,0 +1,51 @@
+# /add_mapping pattern matching: ast.literal_eval over every key (old
+# match_pattern) vs the per-position bitset PatternIndex, for growing
+# signal counts.
+#
+#   python benchmarks/bench_pattern_index.py [max_signals]
+import ast
+import sys
+import time
+
+from bench_util import fmt_us, make_mapping, make_signals, time_per_call
+from mapping_store import PatternIndex, parse_key
+
+
+def literal_eval_match(pattern_str, data_list_strs):
+    pattern = ast.literal_eval(pattern_str)
+    results = []
+    for item_str in data_list_strs:
+        lst = ast.literal_eval(item_str)
+        if len(lst) != len(pattern):
+            continue
+        if all(p == "*" or p == v for p, v in zip(pattern, lst)):
+            results.append(item_str)
+    return results
+
+
+def run(max_signals=18):
+    print(f"{'signals':>8} {'keys':>9} {'pattern':>10} {'matches':>8} {'literal_eval':>15} {'index':>15} {'build':>12}")
+    for n in range(4, max_signals + 1, 2):
+        signals = make_signals(n)
+        mapping = make_mapping(signals)
+        names = list(signals.values())
+        patterns = {
+            "1 fixed": [names[0][0]] + ["*"] * (n - 1),
+            "half": [v[0] if i % 2 == 0 else "*" for i, v in enumerate(names)],
+            "exact": [v[1] for v in names],
+        }
+
+        start = time.perf_counter()
+        index = PatternIndex(parse_key(k) for k in mapping)
+        build = time.perf_counter() - start
+
+        for label, pattern in patterns.items():
+            pattern_str = str(pattern)
+            old = time_per_call(lambda: literal_eval_match(pattern_str, mapping.keys()), min_time=0.5, max_calls=20)
+            new = time_per_call(lambda: index.match(ast.literal_eval(pattern_str)), min_time=0.5)
+            matches = len(index.match(pattern))
+            print(f"{n:>8} {len(mapping):>9} {label:>10} {matches:>8} {fmt_us(old):>15} {fmt_us(new):>15} {build * 1e3:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 18)
@@ -0,0 +1,70 @@
+# UI polling cost of GET /mapping and GET /signals against api.py:
+#   rebuild       first request after a write (/add_mapping for /mapping,
+#                 touching signals.json for /signals): serialise + hash,
+#                 which is what every request cost before the response cache
+#   cached 200    body served from memory
+#   304           revalidation with If-None-Match, no body
+# Uses the simulated robot backend; needs port 7001 free.
+#
+#   python benchmarks/bench_response_cache.py [n_signals] [polls]
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import requests
+
+from bench_util import make_signals, start_api, write_json
+
+URL = "http://localhost:7001"
+
+
+def timed(session, path, polls, headers=None, before=None):
+    times = []
+    response = None
+    for _ in range(polls):
+        if before is not None:
+            before()
+        t = time.perf_counter()
+        response = session.get(URL + path, headers=headers, timeout=60)
+        times.append(time.perf_counter() - t)
+    return statistics.median(times), response
+
+
+def run(n_signals=14, polls=20):
+    signals = make_signals(n_signals)
+    with tempfile.TemporaryDirectory() as directory:
+        write_json(f"{directory}/signals.json", {})
+        write_json(f"{directory}/mapping.json", {})
+        server = start_api(directory, ROBOT_BACKEND="sim")
+        try:
+            session = requests.Session()
+            for name, states in signals.items():
+                session.post(URL + "/add_signal", json={"signal": name, "signal_types": states}, timeout=60)
+            pattern = str(["*"] * n_signals)
+
+            writes = {
+                "/mapping": lambda: session.post(URL + "/add_mapping", json={"signal": pattern, "mapsto": ["fist"]},
+                                                 timeout=60),
+                "/signals": lambda: os.utime(f"{directory}/signals.json"),
+            }
+
+            print(f"{2 ** n_signals} mapping entries, median of {polls} polls")
+            print(f"{'endpoint':>14} {'bytes':>10} {'rebuild':>12} {'cached 200':>12} {'304':>12}")
+            for path in ("/mapping", "/signals"):
+                rebuild, response = timed(session, path, polls, before=writes[path])
+                cached, response = timed(session, path, polls)
+                revalidate, not_modified = timed(session, path, polls, headers={"If-None-Match": response.headers["ETag"]})
+                assert not_modified.status_code == 304
+                print(f"{path:>14} {len(response.content):>10} {rebuild * 1e3:>9.2f} ms {cached * 1e3:>9.2f} ms "
+                      f"{revalidate * 1e3:>9.2f} ms")
+            print(f"response cache: {session.get(URL + '/metrics', timeout=5).json()['responses']}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 14,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20)
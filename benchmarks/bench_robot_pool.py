@@ -0,0 +1,76 @@
+# RoninHand client cost per servo adjustment at a sustained action rate,
+# against the local stub server:
+#   per-call  GET /current_positions + POST /update with module-level
+#             requests calls, one new TCP connection each (old api.py)
+#   pooled    the same two calls through the keep-alive HttpActuator
+#   cached    PositionCache over the pooled client, one POST /update
+#
+#   python benchmarks/bench_robot_pool.py [actions_per_second] [seconds]
+import statistics
+import sys
+import time
+
+import requests
+
+from bench_util import REPO_ROOT  # noqa: F401
+from actuators import HttpActuator, PositionCache
+from stub_roninhand import start_stub
+
+
+def adjust_unpooled(url):
+    positions = requests.get(f"{url}/current_positions", timeout=1).json()
+    positions["servo_1"] += 1
+    requests.post(f"{url}/update", json={"positions": positions}, timeout=1)
+
+
+def adjust_pooled(robot):
+    positions = robot.current_positions()
+    positions["servo_1"] += 1
+    robot.update(positions)
+
+
+def sustained(fn, rate, seconds):
+    # Paced loop at `rate` adjustments/s; returns per-call latencies and
+    # the achieved rate
+    interval = 1.0 / rate
+    latencies = []
+    start = time.perf_counter()
+    next_at = start
+    while time.perf_counter() - start < seconds:
+        t = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t)
+        next_at += interval
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    return latencies, len(latencies) / (time.perf_counter() - start)
+
+
+def report(label, latencies, achieved):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:>10} {achieved:>9.0f}/s {statistics.mean(latencies) * 1e3:>9.2f} ms {p99 * 1e3:>9.2f} ms")
+
+
+def run(rate=200, seconds=3.0):
+    server, url = start_stub()
+    print(f"target {rate} adjustments/s for {seconds:.0f}s each")
+    print(f"{'client':>10} {'achieved':>11} {'mean':>12} {'p99':>12}")
+    latencies, achieved = sustained(lambda: adjust_unpooled(url), rate, seconds)
+    report("per-call", latencies, achieved)
+    robot = HttpActuator(url)
+    latencies, achieved = sustained(lambda: adjust_pooled(robot), rate, seconds)
+    report("pooled", latencies, achieved)
+    cache = PositionCache(robot)
+    latencies, achieved = sustained(lambda: cache.adjust(1, 1), rate, seconds)
+    report("cached", latencies, achieved)
+    print(f"pooled client: {robot.metrics()}")
+    print(f"position cache: {cache.metrics()}")
+    print(f"stub server calls: {server.counts}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 3.0)
@@ -0,0 +1,63 @@
+# Command-to-bus latency of a full 12-servo position update: time from
+# calling update() until the sync-write packet has arrived on the emulated
+# servo bus.
+#   http    bridge -> POST /update -> stub RoninHand server -> SerialActuator
+#   serial  bridge -> SerialActuator (ROBOT_BACKEND=serial)
+# The pseudo-terminal has no wire time; at 1 Mbaud the 44-byte sync-write
+# packet adds ~0.44 ms to both paths on real hardware.
+#
+#   python benchmarks/bench_serial_backend.py [updates]
+import statistics
+import sys
+import time
+
+from bench_util import REPO_ROOT  # noqa: F401
+from actuators import HttpActuator, SerialActuator
+from emulated_servo_bus import EmulatedServoBus
+from stub_roninhand import start_stub
+
+
+def to_bus(bus, robot, updates):
+    latencies = []
+    positions = {f"servo_{i}": 2048 for i in range(1, 13)}
+    for n in range(updates):
+        positions["servo_1"] = 2000 + n % 100
+        bus.sync_written.clear()
+        start = time.perf_counter()
+        robot.update(positions)
+        if not bus.sync_written.wait(1.0):
+            raise RuntimeError("update never reached the bus")
+        latencies.append(bus.last_sync_write - start)
+    return latencies
+
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:>8} {statistics.mean(latencies) * 1e3:>9.3f} ms {p50 * 1e3:>9.3f} ms {p99 * 1e3:>9.3f} ms")
+
+
+def run(updates=2000):
+    print(f"{updates} full-vector updates each")
+    print(f"{'path':>8} {'mean':>12} {'p50':>12} {'p99':>12}")
+
+    bus = EmulatedServoBus()
+    server, url = start_stub(actuator=SerialActuator(bus.port))
+    robot = HttpActuator(url)
+    report("http", to_bus(bus, robot, updates))
+    robot.close()
+    server.actuator.close()
+    server.shutdown()
+    bus.close()
+
+    bus = EmulatedServoBus()
+    robot = SerialActuator(bus.port)
+    report("serial", to_bus(bus, robot, updates))
+    print(f"serial backend: {robot.metrics()}")
+    robot.close()
+    bus.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
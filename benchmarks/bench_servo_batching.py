@@ -0,0 +1,73 @@
+# Servo update batching: realistic action sequences run through the
+# ActionScheduler against the stub RoninHand server, with every adjustment
+# written through immediately (tick 0) vs folded into one /update per
+# tick. Reports /update calls sent and end-to-end completion time (until
+# the last update is acknowledged).
+#
+#   python benchmarks/bench_servo_batching.py [stub_latency_ms]
+import sys
+import time
+
+from bench_util import REPO_ROOT  # noqa: F401
+import actions
+from actuators import HttpActuator, PositionCache
+from stub_roninhand import start_stub
+
+SEQUENCES = {
+    "12-servo pose": ["select_servos1"] + ["increase_servos_angle40", "increment_servos"] * 12,
+    "nudge": ["select_servos3"] + ["increase_servos_angle5"] * 6,
+    "pose + hold": ["select_servos1"] + ["increase_servos_angle40", "increment_servos"] * 5 + ["timesleep50"]
+                   + ["decrement_servos", "decrease_servos_angle40"] * 5,
+}
+
+
+def make_handlers(cache):
+    state = {"servo": 1}
+
+    def next_servo(_):
+        state["servo"] = state["servo"] % actions.NUM_SERVOS + 1
+
+    def prev_servo(_):
+        state["servo"] = (state["servo"] - 2) % actions.NUM_SERVOS + 1
+
+    def select_servo(servo):
+        state["servo"] = servo
+
+    handlers = [None] * actions.NUM_OPCODES
+    handlers[actions.NEXT_SERVO] = next_servo
+    handlers[actions.PREV_SERVO] = prev_servo
+    handlers[actions.SELECT_SERVO] = select_servo
+    handlers[actions.ADJUST_ANGLE] = lambda delta: cache.stage(state["servo"], delta)
+    handlers[actions.GESTURE] = lambda gesture: None
+    return handlers
+
+
+def run(latency_ms=2.0, repeats=5):
+    server, url = start_stub(latency=latency_ms / 1000)
+    print(f"stub latency {latency_ms} ms, mean of {repeats} runs")
+    print(f"{'sequence':>14} {'tick':>6} {'updates':>8} {'completion':>12}")
+    for label, tasks in SEQUENCES.items():
+        program = actions.compile_program(tasks)
+        for tick_ms in (0, 10, 20):
+            robot = HttpActuator(url)
+            cache = PositionCache(robot, tick=tick_ms / 1000)
+            scheduler = actions.ActionScheduler(make_handlers(cache))
+            cache.positions()
+            updates = 0
+            total = 0.0
+            for _ in range(repeats):
+                before = server.counts["update"]
+                start = time.perf_counter()
+                scheduler.start(program)
+                scheduler.wait_idle()
+                cache.wait_flushed()
+                total += time.perf_counter() - start
+                updates += server.counts["update"] - before
+            print(f"{label:>14} {tick_ms:>3} ms {updates / repeats:>8.1f} {total / repeats * 1e3:>9.1f} ms")
+            scheduler.close()
+            cache.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 2.0)
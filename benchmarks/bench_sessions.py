@@ -0,0 +1,101 @@
+# Many gloves against one api.py. Every sender posts 2-signal frames at
+# `rate` Hz over its own keep-alive connection, going back and forth
+# between two combinations; one of them is mapped to increment_servos and
+# DISPATCH_MODE=edge dispatches each change once. With a session per
+# sender, each session's frame count and selected servo must match what
+# its own sender did ("isolated"). The shared run sends the same traffic
+# without ids, the way every sender shared one state before sessions.
+# Reports throughput, POST latency and how many sessions came out right.
+# Uses the simulated robot backend; needs port 7001 free.
+#
+#   python benchmarks/bench_sessions.py [seconds] [rate] [senders ...]
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from bench_util import percentile, start_api, write_json
+
+import actions
+
+URL = "http://localhost:7001"
+SIGNALS = {"bicep": ["true", "false"], "mode": ["0", "1"]}
+FRAMES = (["true", "0"], ["false", "0"])  # the first one moves the servo cursor
+PERIOD = 5  # frames between switches
+
+
+def sender(device, rate, seconds, results):
+    session = requests.Session()
+    latencies = []
+    body = {"signal": list(SIGNALS)}
+    if device is not None:
+        body["device"] = device
+    start = time.perf_counter()
+    n = 0
+    while time.perf_counter() - start < seconds:
+        body["value"] = FRAMES[(n // PERIOD) % 2]
+        t = time.perf_counter()
+        session.post(URL + "/receive_signals", json=body, timeout=10).raise_for_status()
+        latencies.append(time.perf_counter() - t)
+        n += 1
+        delay = start + n / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    segments = (n - 1) // PERIOD + 1 if n else 0
+    results.append((device, n, (segments + 1) // 2, segments, latencies))
+
+
+def load(senders, rate, seconds, shared):
+    results = []
+    threads = [threading.Thread(target=sender, args=(None if shared else f"glove-{i}", rate, seconds, results))
+               for i in range(senders)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    time.sleep(0.5)  # let the schedulers finish
+    return results, elapsed
+
+
+def run(seconds=5.0, rate=20, counts=(1, 8, 32)):
+    print(f"{rate} frames/s per sender for {seconds:.0f}s")
+    print(f"{'senders':>8} {'mode':>9} {'frames/s':>9} {'p50':>9} {'p99':>9} {'isolated':>9}")
+    for senders in counts:
+        for shared in (False, True):
+            with tempfile.TemporaryDirectory() as directory:
+                write_json(f"{directory}/signals.json", SIGNALS)
+                write_json(f"{directory}/mapping.json", {str(FRAMES[0]): ["increment_servos"], str(FRAMES[1]): None,
+                                                         "['true', '1']": None, "['false', '1']": None})
+                # every keep-alive connection holds a worker
+                server = start_api(directory, ROBOT_BACKEND="sim", DISPATCH_MODE="edge",
+                                   API_WORKERS=str(senders + 4), API_MAX_SESSIONS=str(senders + 1))
+                try:
+                    results, elapsed = load(senders, rate, seconds, shared)
+                    metrics = requests.get(URL + "/metrics", timeout=5).json()["sessions"]
+                finally:
+                    server.terminate()
+                    server.wait()
+            latencies = [latency for r in results for latency in r[4]]
+            if shared:
+                isolated = "-"
+            else:
+                ok = sum(1 for device, frames, increments, _, _ in results
+                         if metrics[device]["ingest"]["frames"] == frames
+                         and metrics[device]["servo"] == increments % actions.NUM_SERVOS + 1)
+                isolated = f"{ok}/{senders}"
+            print(f"{senders:>8} {'shared' if shared else 'sessions':>9} "
+                  f"{sum(r[1] for r in results) / elapsed:>9.0f} {percentile(latencies, 0.5) * 1e3:>6.2f} ms "
+                  f"{percentile(latencies, 0.99) * 1e3:>6.2f} ms {isolated:>9}")
+            if shared:
+                print(f"{'':>18} one shared session dispatched {metrics['default']['ingest']['dispatched']} "
+                      f"changes, the senders made {sum(r[3] for r in results)}")
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+        tuple(int(a) for a in sys.argv[3:]) or (1, 8, 32))
@@ -0,0 +1,88 @@
+# Binary signal frames (signal_codec.py) vs JSON for the 7-signal frame
+# hardware/data_read.py sends:
+#   bytes/frame   payload on the signal stream, including its 4-byte length
+#   encode/decode per frame, sender-side encode and server-side decode into
+#                 the {"signal": [...], "value": [...]} dict receive_frame gets
+#   stream        one sender flooding api.py's signal stream with each format
+#                 (simulated robot backend; needs ports 7001 and 7003 free)
+#
+#   python benchmarks/bench_signal_codec.py [frames] [seconds]
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+
+from bench_util import REPO_ROOT, start_api, write_json
+
+import signal_codec
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "hardware"))
+import stream_client  # noqa: E402
+
+SIGNALS = {f"finger{i}": [f"{i}flexed", f"{i}notflexed"] for i in range(1, 6)}
+SIGNALS.update({"bicep": ["true", "false"], "mode": ["0", "1", "2"]})
+
+
+def sample_frames(n, seed=0):
+    rng = random.Random(seed)
+    names = list(SIGNALS)
+    return [(names, [rng.choice(states) for states in SIGNALS.values()]) for _ in range(n)]
+
+
+def per_frame(function, frames):
+    repeats = max(1, 20000 // len(frames))
+    return min(timeit.repeat(lambda: [function(f) for f in frames], number=repeats, repeat=3)) / repeats / len(frames)
+
+
+def codec(frames):
+    sender = stream_client.SignalSchema(SIGNALS)
+    server = signal_codec.SignalSchema(SIGNALS)
+    encoded_json = [json.dumps({"seq": n, "signal": s, "value": v}).encode() for n, (s, v) in enumerate(frames, 1)]
+    encoded_binary = [sender.encode(s, v) for s, v in frames]
+    assert all(server.decode(b) == (s, v) for b, (s, v) in zip(encoded_binary, frames))
+    rows = [
+        ("json", encoded_json,
+         per_frame(lambda f: json.dumps({"seq": 1, "signal": f[0], "value": f[1]}).encode(), frames),
+         per_frame(json.loads, encoded_json)),
+        ("binary", encoded_binary,
+         per_frame(lambda f: sender.encode(*f), frames),
+         per_frame(server.decode_frame, encoded_binary)),
+    ]
+    print(f"{len(frames)} frames of {len(SIGNALS)} signals")
+    print(f"{'':>8} {'bytes/frame':>12} {'encode':>11} {'decode':>11}")
+    for label, encoded, encode, decode in rows:
+        size = sum(len(e) for e in encoded) / len(encoded) + stream_client.LENGTH.size
+        print(f"{label:>8} {size:>12.1f} {encode * 1e6:>8.2f} us {decode * 1e6:>8.2f} us")
+
+
+def stream(frames, seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        write_json(f"{directory}/signals.json", SIGNALS)
+        write_json(f"{directory}/mapping.json", {})
+        server = start_api(directory, ROBOT_BACKEND="sim")
+        try:
+            print(f"\nstream flood for {seconds:.0f}s")
+            for label in ("json", "binary"):
+                schema = stream_client.fetch_schema("http://localhost:7001") if label == "binary" else None
+                sender = stream_client.SignalStream(port=7003, schema=schema)
+                start = time.perf_counter()
+                n = 0
+                while time.perf_counter() - start < seconds:
+                    sender.send(*frames[n % len(frames)])
+                    n += 1
+                sender.flush(30)
+                elapsed = time.perf_counter() - start
+                sender.close()
+                print(f"{label:>8} {n / elapsed:>9.0f} frames/s")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    frames = sample_frames(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
+    codec(frames)
+    stream(frames, float(sys.argv[2]) if len(sys.argv) > 2 else 3.0)
@@ -0,0 +1,151 @@
+# Throughput and tail latency of the signal -> action path with the
+# in-process simulated robot (ROBOT_BACKEND=sim), no RoninHand server.
+#
+#   pipeline  triggers at a fixed rate through the mapping lookup, the
+#             ActionScheduler and the PositionCache into SimulatedActuator;
+#             latency is trigger -> servo update acknowledged, per robot
+#             latency/jitter setting. A trigger preempted by a newer one
+#             before it ran counts as served by the newer one's update.
+#   http      api.py in a subprocess, concurrent senders POSTing
+#             /receive_signals; latency is per request, plus what
+#             GET /metrics reports for dispatch and the simulated robot
+#
+#   python benchmarks/bench_signal_path.py [triggers_per_second] [seconds] [senders]
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from bench_util import make_signals, make_mapping, percentile, start_api, write_json
+import actions
+from actuators import PositionCache, SimulatedActuator
+from mapping_store import MappingTable
+
+ROBOT_SETTINGS = [(0, 0), (2, 0), (2, 3), (5, 20)]  # (latency ms, jitter ms)
+
+
+def pipeline(rate, seconds, latency_ms, jitter_ms, directory):
+    signals = make_signals(8)
+    write_json(os.path.join(directory, "mapping.json"), make_mapping(signals, assign_every=1))
+    table = MappingTable(os.path.join(directory, "mapping.json"), compiler=actions.ProgramCompiler())
+    table.assign(("*",) * 8, ["select_servos1", "increase_servos_angle1"])
+    robot = SimulatedActuator(latency=latency_ms / 1000, jitter=jitter_ms / 1000, seed=1)
+    cache = PositionCache(robot, reconcile_interval=0)
+    handlers = [None] * actions.NUM_OPCODES
+    state = {"servo": 1}
+    # every program ends with a marker step carrying its trigger number;
+    # with tick 0 the update before it has been acknowledged when it runs
+    marks = []
+    handlers[actions.NEXT_SERVO] = handlers[actions.PREV_SERVO] = lambda _: None
+    handlers[actions.GESTURE] = lambda k: marks.append((k, time.perf_counter()))
+    handlers[actions.SELECT_SERVO] = lambda servo: state.update(servo=servo)
+    handlers[actions.ADJUST_ANGLE] = lambda delta: cache.stage(state["servo"], delta)
+    scheduler = actions.ActionScheduler(handlers)
+    cache.positions()
+    combos = [tuple(states[n % len(states)] for states in signals.values()) for n in range(64)]
+
+    sent = []
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    next_at = start
+    n = 0
+    while time.perf_counter() - start < seconds:
+        sent.append(time.perf_counter())
+        scheduler.start(table.lookup_program(combos[n % len(combos)]) + ((actions.GESTURE, n),))
+        n += 1
+        next_at += interval
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    scheduler.wait_idle(5)
+    cache.wait_flushed(5)
+    achieved = len(sent) / (time.perf_counter() - start)
+
+    latencies = []
+    i = 0
+    for k, at in enumerate(sent):
+        while i < len(marks) and marks[i][0] < k:
+            i += 1
+        if i == len(marks):
+            break
+        latencies.append(marks[i][1] - at)
+    metrics = scheduler.metrics()
+    scheduler.close()
+    cache.close()
+    return achieved, latencies, len(marks), metrics
+
+
+def http(rate, seconds, senders, latency_ms, jitter_ms, directory):
+    write_json(os.path.join(directory, "signals.json"), {})
+    write_json(os.path.join(directory, "mapping.json"), {})
+    server = start_api(directory, ROBOT_BACKEND="sim", ROBOT_SIM_LATENCY_MS=str(latency_ms),
+                       ROBOT_SIM_JITTER_MS=str(jitter_ms), ROBOT_UPDATE_TICK_MS="0")
+    url = "http://localhost:7001"
+    try:
+        requests.post(url + "/add_signal", json={"signal": "bicep", "signal_types": ["true", "false"]}, timeout=5)
+        requests.post(url + "/add_mapping", json={"signal": "['*']", "mapsto": ["select_servos1", "increase_servos_angle1"]},
+                      timeout=5)
+
+        latencies = []
+        lock = threading.Lock()
+
+        def sender(offset):
+            session = requests.Session()
+            interval = senders / rate
+            start = time.perf_counter()
+            next_at = start + offset * interval / senders
+            mine = []
+            while time.perf_counter() - start < seconds:
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                t = time.perf_counter()
+                session.post(url + "/receive_signals", json={"signal": "bicep", "value": "true"}, timeout=5)
+                mine.append(time.perf_counter() - t)
+                next_at += interval
+            with lock:
+                latencies.extend(mine)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=sender, args=(i,)) for i in range(senders)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        achieved = len(latencies) / (time.perf_counter() - start)
+        time.sleep(0.2)
+        metrics = requests.get(url + "/metrics", timeout=5).json()
+    finally:
+        server.terminate()
+        server.wait()
+    return achieved, latencies, metrics
+
+
+def run(rate=100, seconds=3.0, senders=4):
+    print(f"pipeline: {rate} triggers/s for {seconds:.0f}s, trigger -> servo update acknowledged")
+    print(f"{'robot':>14} {'achieved':>10} {'ran':>6} {'p50':>10} {'p99':>10} {'max':>10}")
+    for latency_ms, jitter_ms in ROBOT_SETTINGS:
+        with tempfile.TemporaryDirectory() as directory:
+            achieved, latencies, ran, _ = pipeline(rate, seconds, latency_ms, jitter_ms, directory)
+        print(f"{latency_ms:>4} ms +{jitter_ms:>2} ms {achieved:>8.0f}/s {ran:>6} "
+              f"{percentile(latencies, 0.5) * 1e3:>7.2f} ms {percentile(latencies, 0.99) * 1e3:>7.2f} ms "
+              f"{max(latencies) * 1e3:>7.2f} ms")
+
+    latency_ms, jitter_ms = ROBOT_SETTINGS[2]
+    print(f"\nhttp: {senders} senders, {rate} POST /receive_signals/s total for {seconds:.0f}s, "
+          f"robot {latency_ms} ms + {jitter_ms} ms")
+    with tempfile.TemporaryDirectory() as directory:
+        achieved, latencies, metrics = http(rate, seconds, senders, latency_ms, jitter_ms, directory)
+    print(f"achieved {achieved:.0f} req/s, p50 {percentile(latencies, 0.5) * 1e3:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1e3:.2f} ms, max {max(latencies) * 1e3:.2f} ms")
+    print(f"dispatch: {metrics['dispatch']}")
+    print(f"robot: {metrics['robot']}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 3.0,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 4)
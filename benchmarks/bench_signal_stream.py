@@ -0,0 +1,122 @@
+# Live signal ingestion into api.py: the length-prefixed signal stream vs
+# one keep-alive POST /receive_signals per sample.
+#   paced   several devices at a fixed rate each; per-frame sender cost
+#           (time spent in send / post) and time until the frame was
+#           acknowledged (stream ack / HTTP response)
+#   flood   one device sending as fast as it can
+# Uses the simulated robot backend; needs ports 7001 and 7003 free.
+#
+#   python benchmarks/bench_signal_stream.py [devices] [rate] [seconds]
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from bench_util import REPO_ROOT, percentile, start_api, write_json
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "hardware"))
+from stream_client import SignalStream  # noqa: E402
+
+URL = "http://localhost:7001"
+
+
+class TimedStream(SignalStream):
+    # records send -> ack latency per frame
+    def __init__(self, *args, **kwargs):
+        self.sent_at = {}
+        self.ack_latencies = []
+        super().__init__(*args, **kwargs)
+
+    def send(self, signal, value):
+        t = time.perf_counter()
+        seq = super().send(signal, value)
+        self.sent_at[seq] = t
+        return seq
+
+    def _acknowledged(self, seq, window):
+        now = time.perf_counter()
+        for n in [n for n in self.sent_at if n <= seq]:
+            self.ack_latencies.append(now - self.sent_at.pop(n))
+        super()._acknowledged(seq, window)
+
+
+def device(transport, rate, seconds, results):
+    costs, acks = [], []
+    if transport == "stream":
+        stream = TimedStream(port=7003)
+        send = lambda value: stream.send("bicep", value)  # noqa: E731
+    else:
+        session = requests.Session()
+        send = lambda value: session.post(URL + "/receive_signals", json={"signal": "bicep", "value": value},  # noqa: E731
+                                          timeout=5)
+    interval = 1.0 / rate if rate else 0.0
+    start = time.perf_counter()
+    next_at = start
+    n = 0
+    while time.perf_counter() - start < seconds:
+        t = time.perf_counter()
+        send("true" if n % 2 else "false")
+        cost = time.perf_counter() - t
+        costs.append(cost)
+        n += 1
+        if interval:
+            next_at += interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    elapsed = time.perf_counter() - start
+    if transport == "stream":
+        stream.flush()
+        acks = stream.ack_latencies
+        stream.close()
+    else:
+        acks = costs
+    results.append((n / elapsed, costs, acks))
+
+
+def load(transport, devices, rate, seconds):
+    results = []
+    threads = [threading.Thread(target=device, args=(transport, rate, seconds, results)) for _ in range(devices)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = sum(r[0] for r in results)
+    costs = [c for r in results for c in r[1]]
+    acks = [a for r in results for a in r[2]]
+    return total, costs, acks
+
+
+def report(label, total, costs, acks):
+    print(f"{label:>8} {total:>9.0f}/s {percentile(costs, 0.5) * 1e3:>8.3f} ms {percentile(costs, 0.99) * 1e3:>8.3f} ms "
+          f"{percentile(acks, 0.5) * 1e3:>8.3f} ms {percentile(acks, 0.99) * 1e3:>8.3f} ms")
+
+
+def run(devices=4, rate=100, seconds=5.0):
+    with tempfile.TemporaryDirectory() as directory:
+        write_json(f"{directory}/signals.json", {"bicep": ["true", "false"]})
+        write_json(f"{directory}/mapping.json", {"['true']": None, "['false']": None})
+        server = start_api(directory, ROBOT_BACKEND="sim")
+        try:
+            header = f"{'':>8} {'frames':>11} {'send p50':>11} {'send p99':>11} {'ack p50':>11} {'ack p99':>11}"
+            print(f"paced: {devices} devices x {rate} Hz for {seconds:.0f}s")
+            print(header)
+            for transport in ("http", "stream"):
+                report(transport, *load(transport, devices, rate, seconds))
+            print(f"\nflood: 1 device, {seconds:.0f}s")
+            print(header)
+            for transport in ("http", "stream"):
+                report(transport, *load(transport, 1, 0, seconds))
+            print(f"\nstream server: {requests.get(URL + '/metrics', timeout=5).json()['stream']}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 5.0)
@@ -0,0 +1,128 @@
+# Live signal ingestion into api.py: UDP datagrams vs one keep-alive
+# POST /receive_signals per sample.
+#   paced    several devices at a fixed rate each; per-frame sender cost
+#            and delivery (HTTP: until the response; UDP: the server's
+#            age of accepted frames, sender clock to apply, from /metrics)
+#   flood    one device sending as fast as it can; how many datagrams the
+#            server accepted vs sent
+#   disorder duplicated, swapped, skipped and stale datagrams, to show they
+#            are dropped and counted instead of applied
+# Uses the simulated robot backend; needs port 7001 and UDP port 7004 free.
+#
+#   python benchmarks/bench_signal_udp.py [devices] [rate] [seconds]
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from bench_util import REPO_ROOT, percentile, start_api, write_json
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "hardware"))
+from stream_client import DATAGRAM_HEADER, KIND_JSON, SignalDatagrams  # noqa: E402
+
+URL = "http://localhost:7001"
+UDP_PORT = 7004
+
+
+def device(transport, rate, seconds, results):
+    costs = []
+    if transport == "udp":
+        sender = SignalDatagrams(port=UDP_PORT)
+        send = lambda value: sender.send("bicep", value)  # noqa: E731
+    else:
+        session = requests.Session()
+        send = lambda value: session.post(URL + "/receive_signals", json={"signal": "bicep", "value": value},  # noqa: E731
+                                          timeout=5)
+    interval = 1.0 / rate if rate else 0.0
+    start = time.perf_counter()
+    next_at = start
+    n = 0
+    while time.perf_counter() - start < seconds:
+        t = time.perf_counter()
+        send("true" if n % 2 else "false")
+        costs.append(time.perf_counter() - t)
+        n += 1
+        if interval:
+            next_at += interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    results.append((n, n / (time.perf_counter() - start), costs))
+
+
+def load(transport, devices, rate, seconds):
+    results = []
+    threads = [threading.Thread(target=device, args=(transport, rate, seconds, results)) for _ in range(devices)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(0.5)  # let the server drain its socket buffer
+    return sum(r[0] for r in results), sum(r[1] for r in results), [c for r in results for c in r[2]]
+
+
+def udp_metrics():
+    return requests.get(URL + "/metrics", timeout=5).json()["udp"]
+
+
+def delta(after, before):
+    return {key: after[key] - before[key] for key in after if isinstance(after[key], int)}
+
+
+def disorder():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    body = b'{"signal": "bicep", "value": "true"}'
+    now = time.time()
+    sends = [(1, now), (2, now), (2, now), (4, now), (3, now), (5, now - 1.0), (6, now)]
+    for seq, sent in sends:
+        sock.sendto(DATAGRAM_HEADER.pack(KIND_JSON, seq, int(sent * 1e6)) + body, ("127.0.0.1", UDP_PORT))
+    sock.close()
+    time.sleep(0.2)
+    return [seq for seq, _ in sends]
+
+
+def run(devices=4, rate=100, seconds=5.0):
+    with tempfile.TemporaryDirectory() as directory:
+        write_json(f"{directory}/signals.json", {"bicep": ["true", "false"]})
+        write_json(f"{directory}/mapping.json", {"['true']": None, "['false']": None})
+        server = start_api(directory, ROBOT_BACKEND="sim", UDP_PORT=str(UDP_PORT))
+        try:
+            header = f"{'':>6} {'frames':>11} {'applied':>9} {'send p50':>11} {'send p99':>11} {'delivery':>22}"
+            for label, n_devices, n_rate in ((f"paced: {devices} devices x {rate} Hz", devices, rate),
+                                             ("flood: 1 device", 1, 0)):
+                print(f"{label} for {seconds:.0f}s")
+                print(header)
+                for transport in ("http", "udp"):
+                    before = udp_metrics()
+                    sent, per_second, costs = load(transport, n_devices, n_rate, seconds)
+                    if transport == "udp":
+                        after = udp_metrics()
+                        applied = after["accepted"] - before["accepted"]
+                        age = (after["age_ms"]["mean"] * after["accepted"]
+                               - before["age_ms"]["mean"] * before["accepted"]) / max(applied, 1)
+                        delivery = f"age mean {age:.3f} ms"
+                    else:
+                        applied = sent
+                        delivery = f"p99 {percentile(costs, 0.99) * 1e3:.3f} ms"
+                    print(f"{transport:>6} {per_second:>9.0f}/s {applied / sent:>8.1%} "
+                          f"{percentile(costs, 0.5) * 1e3:>8.3f} ms {percentile(costs, 0.99) * 1e3:>8.3f} ms "
+                          f"{delivery:>22}")
+                print()
+            before = udp_metrics()
+            order = disorder()
+            print(f"disorder: sent seq {order} (5 is 1 s old)")
+            print(f"  counted {delta(udp_metrics(), before)}")
+            print(f"\nudp server: {udp_metrics()}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 5.0)
@@ -0,0 +1,53 @@
+# Dense (full cartesian product in mapping.json) vs sparse (rules only in
+# mapping.rules.json) mapping stores: schema change cost, file size,
+# wildcard assignment cost and per-trigger lookup latency.
+#
+#   python benchmarks/bench_sparse_mapping.py [max_signals]
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bench_util import fmt_us, make_signals, time_per_call, write_json
+from mapping_store import MappingTable, SparseMapping
+
+
+def measure(store, signals, path):
+    start = time.perf_counter()
+    store.reset(signals)
+    reset = time.perf_counter() - start
+
+    names = list(signals.values())
+    start = time.perf_counter()
+    for i in range(20):
+        pattern = ["*"] * len(names)
+        pattern[i % len(names)] = names[i % len(names)][0]
+        pattern[(i + 1) % len(names)] = names[(i + 1) % len(names)][1]
+        store.assign(pattern, [f"gesture{i}"])
+    assign = (time.perf_counter() - start) / 20
+
+    combos = [tuple(random.choice(v) for v in names) for _ in range(1000)]
+    it = iter(combos * 1000)
+    lookup = time_per_call(lambda: store.lookup(next(it)))
+    return reset, assign, lookup, os.path.getsize(path)
+
+
+def run(max_signals=16):
+    print(f"{'signals':>8} {'store':>7} {'reset':>12} {'assign':>12} {'lookup':>15} {'file':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        signals_path = os.path.join(tmp, "signals.json")
+        for n in range(4, max_signals + 1, 2):
+            signals = make_signals(n)
+            write_json(signals_path, signals)
+            stores = {
+                "dense": (MappingTable(os.path.join(tmp, "mapping.json")), os.path.join(tmp, "mapping.json")),
+                "sparse": (SparseMapping(os.path.join(tmp, "mapping.rules.json"), signals_path), os.path.join(tmp, "mapping.rules.json")),
+            }
+            for label, (store, path) in stores.items():
+                reset, assign, lookup, size = measure(store, signals, path)
+                print(f"{n:>8} {label:>7} {reset * 1e3:>9.1f} ms {assign * 1e3:>9.1f} ms {fmt_us(lookup)} {size:>10} B")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 16)
@@ -0,0 +1,105 @@
+# Contention on live signal state: writer threads publish whole frames
+# (every signal set to the same token) while reader threads read the state
+# the way evaluation, /state and /metrics do.
+#   dict            one dict updated a key at a time, read without a lock
+#                   (what api.py's globals amounted to once requests ran on
+#                   several threads)
+#   dict+lock       the same dict behind a lock for both sides
+#   snapshots       state_store.StateStore: lock-free reads of immutable
+#                   versioned snapshots
+# A read is torn if its signals do not all carry the same token.
+#
+#   python benchmarks/bench_state_store.py [writers] [readers] [signals] [seconds]
+import sys
+import threading
+import time
+
+from bench_util import percentile
+
+from state_store import StateStore
+
+
+class DictState:
+    def __init__(self, names, lock):
+        self.values = {name: None for name in names}
+        self.lock = lock
+
+    def write(self, names, token):
+        if self.lock is None:
+            for name in names:
+                self.values[name] = token
+        else:
+            with self.lock:
+                for name in names:
+                    self.values[name] = token
+
+    def read(self):
+        if self.lock is None:
+            return tuple(self.values.values())
+        with self.lock:
+            return tuple(self.values.values())
+
+
+class SnapshotState:
+    def __init__(self, names):
+        self.store = StateStore(names)
+        self.positions = range(len(names))
+
+    def write(self, names, token):
+        self.store.publish([(i, token) for i in self.positions])
+
+    def read(self):
+        return self.store.snapshot().values
+
+
+def contend(state, names, writers, readers, seconds):
+    stop = threading.Event()
+    writes = [0] * writers
+    reads = [[] for _ in range(readers)]
+    torn = [0] * readers
+
+    def writer(w):
+        k = 0
+        while not stop.is_set():
+            k += 1
+            state.write(names, (w, k))
+        writes[w] = k
+
+    def reader(r):
+        latencies = reads[r]
+        while not stop.is_set():
+            t = time.perf_counter()
+            values = state.read()
+            latencies.append(time.perf_counter() - t)
+            if values[0] is not None and values.count(values[0]) != len(values):
+                torn[r] += 1
+
+    threads = ([threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+               + [threading.Thread(target=reader, args=(r,)) for r in range(readers)])
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    # threads starved of the lock can run well past `seconds`
+    elapsed = time.perf_counter() - start
+    latencies = [latency for r in reads for latency in r]
+    return sum(writes) / elapsed, len(latencies) / elapsed, sum(torn), latencies
+
+
+def run(writers=4, readers=8, n_signals=7, seconds=3.0):
+    names = [f"signal{i}" for i in range(n_signals)]
+    print(f"{writers} writers, {readers} readers, {n_signals} signals, {seconds:.0f}s each")
+    print(f"{'':>10} {'frames/s':>10} {'reads/s':>10} {'read p50':>10} {'read p99':>10} {'read max':>10} {'torn':>8}")
+    for label, state in (("dict", DictState(names, None)),
+                         ("dict+lock", DictState(names, threading.Lock())),
+                         ("snapshots", SnapshotState(names))):
+        frames, reads, torn, latencies = contend(state, names, writers, readers, seconds)
+        print(f"{label:>10} {frames:>10.0f} {reads:>10.0f} {percentile(latencies, 0.5) * 1e6:>7.2f} us "
+              f"{percentile(latencies, 0.99) * 1e6:>7.2f} us {max(latencies) * 1e3:>7.2f} ms {torn:>8}")
+
+
+if __name__ == "__main__":
+    run(*(int(a) for a in sys.argv[1:4]), *(float(a) for a in sys.argv[4:5]))
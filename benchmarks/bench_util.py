@@ -0,0 +1,67 @@
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def make_signals(n_signals, n_states=2):
+    # finger1: ["1s0", "1s1"], finger2: ["2s0", "2s1"], ...
+    return {f"signal{i}": [f"{i}s{j}" for j in range(n_states)] for i in range(1, n_signals + 1)}
+
+
+def make_mapping(signals, assign_every=7):
+    # Full cartesian product like /add_signal writes, with a sprinkling of assigned actions
+    mapping = {}
+    for n, combo in enumerate(itertools.product(*signals.values())):
+        mapping[str(list(combo))] = ["fist", "increase_servos_angle10"] if n % assign_every == 0 else None
+    return mapping
+
+
+def write_json(path, data):
+    with open(path, "w") as file:
+        json.dump(data, file, indent=4)
+
+
+def time_per_call(fn, min_time=0.5, max_calls=100000):
+    # Run fn until min_time has elapsed and return mean seconds per call
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or calls >= max_calls:
+            return elapsed / calls
+
+
+def fmt_us(seconds):
+    return f"{seconds * 1e6:12.1f} us"
+
+
+def start_api(directory, url="http://localhost:7001", **env):
+    # Run api.py from the repo in `directory` with extra environment
+    # variables and wait until it answers; returns the process
+    import requests
+    process = subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, "api.py")], cwd=directory,
+                               env=dict(os.environ, **env), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        if process.poll() is not None:
+            raise RuntimeError("api.py exited on startup; is port 7001 free?")
+        try:
+            requests.get(url + "/metrics", timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("api.py did not start")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
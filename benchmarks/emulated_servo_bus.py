@@ -0,0 +1,127 @@
+# Pseudo-terminal stand-in for an STS/SCS servo bus, for driving the
+# bridge's SerialActuator without hardware. Answers PING, READ, WRITE,
+# SYNC_WRITE and SYNC_READ for a set of servo ids; present position
+# follows goal position immediately. `bus.port` is the device path to open.
+#
+#   python benchmarks/emulated_servo_bus.py
+import os
+import threading
+import time
+import tty
+
+from bench_util import REPO_ROOT  # noqa: F401
+from actuators import STS_GOAL_POSITION, STS_PRESENT_POSITION
+
+INST_PING = 0x01
+INST_READ = 0x02
+INST_WRITE = 0x03
+INST_SYNC_READ = 0x82
+INST_SYNC_WRITE = 0x83
+
+
+def _checksum(body) -> int:
+    return ~sum(body) & 0xFF
+
+
+class EmulatedServoBus:
+    def __init__(self, servo_ids=range(1, 13), position=2048):
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self._slave = slave
+        self.memory = {scs_id: bytearray(256) for scs_id in servo_ids}
+        for scs_id in self.memory:
+            self._set_word(scs_id, STS_GOAL_POSITION, position)
+            self._set_word(scs_id, STS_PRESENT_POSITION, position)
+        self.counts = {"packets": 0, "sync_writes": 0, "sync_reads": 0, "bad_checksums": 0}
+        # perf_counter() when the last complete SYNC_WRITE arrived
+        self.last_sync_write = 0.0
+        self.sync_written = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="servo-bus", daemon=True)
+        self._thread.start()
+
+    def _set_word(self, scs_id, address, value):
+        self.memory[scs_id][address:address + 2] = value.to_bytes(2, "little")
+
+    def positions(self):
+        return {scs_id: int.from_bytes(mem[STS_PRESENT_POSITION:STS_PRESENT_POSITION + 2], "little")
+                for scs_id, mem in self.memory.items()}
+
+    def _reply(self, scs_id, params=b""):
+        body = bytes([scs_id, len(params) + 2, 0]) + params
+        os.write(self.master, b"\xff\xff" + body + bytes([_checksum(body)]))
+
+    def _write(self, scs_id, address, data):
+        mem = self.memory.get(scs_id)
+        if mem is None:
+            return
+        mem[address:address + len(data)] = data
+        if address <= STS_GOAL_POSITION < address + len(data):
+            mem[STS_PRESENT_POSITION:STS_PRESENT_POSITION + 2] = mem[STS_GOAL_POSITION:STS_GOAL_POSITION + 2]
+
+    def _handle(self, scs_id, inst, params):
+        self.counts["packets"] += 1
+        if inst == INST_SYNC_WRITE:
+            address, length = params[0], params[1]
+            for i in range(2, len(params), length + 1):
+                self._write(params[i], address, params[i + 1:i + 1 + length])
+            self.counts["sync_writes"] += 1
+            self.last_sync_write = time.perf_counter()
+            self.sync_written.set()
+        elif inst == INST_SYNC_READ:
+            address, length = params[0], params[1]
+            self.counts["sync_reads"] += 1
+            for target in params[2:]:
+                if target in self.memory:
+                    self._reply(target, bytes(self.memory[target][address:address + length]))
+        elif scs_id in self.memory:
+            if inst == INST_READ:
+                self._reply(scs_id, bytes(self.memory[scs_id][params[0]:params[0] + params[1]]))
+                return
+            if inst == INST_WRITE:
+                self._write(scs_id, params[0], params[1:])
+            self._reply(scs_id)
+
+    def _loop(self):
+        buffer = bytearray()
+        while not self._closed:
+            try:
+                chunk = os.read(self.master, 4096)
+            except OSError:
+                return
+            if not chunk:
+                return
+            buffer += chunk
+            while True:
+                start = buffer.find(b"\xff\xff")
+                if start < 0:
+                    del buffer[:-1]
+                    break
+                del buffer[:start]
+                if len(buffer) < 4:
+                    break
+                end = 4 + buffer[3]
+                if len(buffer) < end:
+                    break
+                packet = bytes(buffer[:end])
+                del buffer[:end]
+                if packet[-1] != _checksum(packet[2:-1]):
+                    self.counts["bad_checksums"] += 1
+                    continue
+                self._handle(packet[2], packet[4], packet[5:-1])
+
+    def close(self):
+        self._closed = True
+        os.close(self._slave)
+        os.close(self.master)
+
+
+if __name__ == "__main__":
+    bus = EmulatedServoBus()
+    print(f"Emulated servo bus on {bus.port} (ids {sorted(bus.memory)})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        bus.close()
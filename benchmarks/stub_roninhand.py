@@ -0,0 +1,87 @@
+# Minimal stand-in for the RoninHand server (GET /current_positions,
+# POST /update, POST /execute) speaking HTTP/1.1 keep-alive, for driving
+# the bridge's robot client in benchmarks. With an actuator, /update is
+# also forwarded to it, the way the real server drives the servo bus.
+#
+#   python benchmarks/stub_roninhand.py [port]
+import http.server
+import json
+import sys
+import threading
+import time
+
+
+class StubRoninHand(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, latency=0.0, actuator=None):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.actuator = actuator
+        self.lock = threading.Lock()
+        self.positions = {f"servo_{i}": 2048 for i in range(1, 13)}
+        self.counts = {"current_positions": 0, "update": 0, "execute": 0}
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out as separate writes; without this, Nagle plus
+    # delayed ACKs add ~40 ms to every keep-alive response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.path == "/current_positions":
+            with self.server.lock:
+                self.server.counts["current_positions"] += 1
+                positions = dict(self.server.positions)
+            self._reply(positions)
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        with self.server.lock:
+            if self.path == "/update":
+                self.server.counts["update"] += 1
+                self.server.positions.update(body.get("positions", {}))
+                if self.server.actuator is not None:
+                    self.server.actuator.update(body.get("positions", {}))
+            elif self.path == "/execute":
+                self.server.counts["execute"] += 1
+            else:
+                self.send_error(404)
+                return
+        self._reply({"ok": True})
+
+
+def start_stub(port=0, latency=0.0, actuator=None):
+    # Returns (server, base_url); the server runs on a daemon thread
+    server = StubRoninHand(("127.0.0.1", port), latency, actuator)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    server, url = start_stub(int(sys.argv[1]) if len(sys.argv) > 1 else 8000)
+    print(f"Stub RoninHand server running at {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
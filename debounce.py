@@ -0,0 +1,185 @@
+import json
+import os
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# Per-signal debouncing for /receive_signals, configured in a JSON file
+# next to signals.json (debounce.json by default):
+#   {"repeat_ms": 1000,
+#    "default": {"window_ms": 0, "min_hold_ms": 0, "confirm": 1},
+#    "signals": {"bicep": {"window_ms": 80, "min_hold_ms": 300, "confirm": 2}}}
+# A new state of a signal is accepted once it has been seen in `confirm`
+# consecutive samples spanning at least `window_ms`, and not before the
+# current state has been held for `min_hold_ms`. Going back to the current
+# state in between cancels the change, so a twitchy EMG channel can get
+# a wide window and a glove finger none. Signal states are categories, so
+# this is the hysteresis: a state has to win repeatedly to replace the
+# current one. Candidates are only checked when a sample arrives.
+#
+# DebounceEngine.update() is O(1): signals are slots by position in
+# signals.json and it keeps a running count of the signals that have no
+# state yet.
+DEFAULTS = {"window_ms": 0, "min_hold_ms": 0, "confirm": 1}
+REPEAT_MS = 1000
+# unknown signal names already warned about, so a stale entry is reported
+# once rather than every time an engine is rebuilt
+_warned = set()
+
+
+class _Slot:
+    __slots__ = ("window", "min_hold", "confirm", "state", "changed_at", "candidate", "since", "count", "epoch")
+
+    def __init__(self, window: float, min_hold: float, confirm: int):
+        self.window = window
+        self.min_hold = min_hold
+        self.confirm = confirm
+        self.state = None
+        self.changed_at = 0.0
+        self.candidate = None
+        self.since = 0.0
+        self.count = 0
+        self.epoch = -1
+
+
+def load_config(path: str) -> Dict:
+    # a missing file means no debouncing beyond the repeat gate
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+class DebounceEngine:
+    # update() returns True when the fused state should be evaluated:
+    #   - every signal has a state and one of them just changed, or
+    #   - the combination is unchanged but every signal has been sampled
+    #     again at least repeat_ms after the last evaluation (the old
+    #     one-second gate, which re-runs the same combination)
+    def __init__(self, names: Sequence[str], config: Optional[Dict] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        config = config or {}
+        default = dict(DEFAULTS, **config.get("default", {}))
+        per_signal = config.get("signals", {})
+        # entries for signals not in signals.json (a typo, or a signal
+        # removed since) are ignored; a config file never stops ingestion
+        unknown = sorted(set(per_signal) - set(names) - _warned)
+        if unknown:
+            _warned.update(unknown)
+            print(f"Ignoring debounce settings for unknown signals {unknown}")
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.slots = []
+        for name in self.names:
+            settings = dict(default, **per_signal.get(name, {}))
+            self.slots.append(_Slot(settings["window_ms"] / 1000, settings["min_hold_ms"] / 1000,
+                                    max(1, int(settings["confirm"]))))
+        self.repeat = config.get("repeat_ms", REPEAT_MS) / 1000
+        self.clock = clock
+        self.missing = len(self.slots)
+        self.epoch = 0
+        self.refreshed = 0
+        self.evaluated_at = None
+        self._counts = {"samples": 0, "changes": 0, "cancelled": 0, "held": 0, "unknown": 0,
+                        "evaluations": 0, "repeats": 0}
+
+    def update(self, signal: str, value, now: Optional[float] = None) -> bool:
+        # one sample; call evaluated() after acting on a True
+        now = self.clock() if now is None else now
+        return self._ready(self._apply(signal, value, now))
+
+    def update_frame(self, signals: Sequence[str], values: Sequence, now: Optional[float] = None) -> bool:
+        # a whole frame, judged once after all of it is applied
+        now = self.clock() if now is None else now
+        changed = False
+        for signal, value in zip(signals, values):
+            changed = self._apply(signal, value, now) or changed
+        return self._ready(changed)
+
+    def _apply(self, signal: str, value, now: float) -> bool:
+        i = self.index.get(signal)
+        if i is None:
+            self._counts["unknown"] += 1
+            return False
+        self._counts["samples"] += 1
+        return self._sample(self.slots[i], value, now)
+
+    def _ready(self, changed: bool) -> bool:
+        if self.missing:
+            return False
+        if changed:
+            return True
+        if self.refreshed == len(self.slots):
+            self._counts["repeats"] += 1
+            return True
+        return False
+
+    def _sample(self, slot: _Slot, value, now: float) -> bool:
+        if (self.evaluated_at is not None and slot.epoch != self.epoch
+                and now - self.evaluated_at >= self.repeat):
+            slot.epoch = self.epoch
+            self.refreshed += 1
+        changed = False
+        if value == slot.state:
+            if slot.candidate is not None:
+                self._counts["cancelled"] += 1
+                slot.candidate = None
+        else:
+            if value != slot.candidate:
+                if slot.candidate is not None:
+                    self._counts["cancelled"] += 1
+                slot.candidate = value
+                slot.since = now
+                slot.count = 0
+            slot.count += 1
+            if slot.count >= slot.confirm and now - slot.since >= slot.window:
+                if slot.state is not None and now - slot.changed_at < slot.min_hold:
+                    self._counts["held"] += 1
+                else:
+                    if slot.state is None:
+                        self.missing -= 1
+                    slot.state = value
+                    slot.changed_at = now
+                    slot.candidate = None
+                    changed = True
+                    self._counts["changes"] += 1
+        return changed
+
+    def evaluated(self, now: Optional[float] = None):
+        # starts a new repeat period
+        self.evaluated_at = self.clock() if now is None else now
+        self.epoch += 1
+        self.refreshed = 0
+        self._counts["evaluations"] += 1
+
+    def accepted(self, signal: str):
+        i = self.index.get(signal)
+        return None if i is None else self.slots[i].state
+
+    def state(self) -> Dict[str, object]:
+        return {name: slot.state for name, slot in zip(self.names, self.slots)}
+
+    def combination(self) -> Tuple:
+        return tuple(slot.state for slot in self.slots)
+
+    def metrics(self) -> Dict[str, int]:
+        return dict(self._counts, missing=self.missing)
+
+
+class EdgeTrigger:
+    # Edge-triggered dispatch: a combination the engine wants evaluated is
+    # let through only when it differs from the last one let through, or
+    # when `rearm` seconds have passed since that one was (0 never re-arms).
+    def __init__(self, rearm: float = 0.0):
+        self.rearm = rearm
+        self.last = None
+        self.last_at = 0.0
+
+    def allow(self, combination: Tuple, now: float) -> bool:
+        if combination == self.last and not (self.rearm and now - self.last_at >= self.rearm):
+            return False
+        self.last = combination
+        self.last_at = now
+        return True
+
+    def reset(self):
+        self.last = None
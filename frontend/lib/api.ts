@@ -5,7 +5,8 @@ import { SignalsZ, MappingZ, type Signals, type Mapping } from "./types";
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://127.0.0.1:7001";
 
 async function get<T>(path: string, schema: z.ZodSchema<T>): Promise<T> {
-	const res = await fetch(`${API_URL}${path}`, { cache: "no-store" });
+	// revalidate with the ETag every time; an unchanged body comes back as a 304
+	const res = await fetch(`${API_URL}${path}`, { cache: "no-cache" });
 	if (!res.ok) throw new Error(`${res.status} ${res.statusText}`);
 	const json = await res.json();
 	const parsed = schema.parse(json);
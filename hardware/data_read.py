@@ -4,6 +4,7 @@
 import serial
 import time
 import requests
+from stream_client import SignalStream, fetch_schema
 
 from pylsl import StreamInlet, resolve_byprop
 import time
@@ -34,6 +35,36 @@ mode = 0
 
 # Local API endpoint
 url = "http://127.0.0.1:7001/receive_signals"  # change to your API route
+# one keep-alive connection for every POST instead of a new one each time
+session = requests.Session()
+# api.py's signal stream port; frames are pipelined instead of one POST
+# round trip each. Set to None to POST to url instead.
+stream_port = 7003
+# send each frame as one byte per signal (indices into the server's
+# signals.json) instead of JSON; the schema is fetched again on every
+# reconnect
+binary_frames = True
+# names this glove's session on the server when several gloves share it
+device_id = None
+# the stream is opened on the first frame and reopened this many seconds
+# after it drops or the server is not up; frames are POSTed meanwhile
+reconnect_interval = 5.0
+stream = None
+next_connect = 0.0
+
+
+def connect_stream():
+    try:
+        schema = fetch_schema("http://127.0.0.1:7001") if binary_frames else None
+        return SignalStream("127.0.0.1", stream_port, schema=schema, device=device_id)
+    except (OSError, ValueError) as e:
+        print(f"Signal stream unavailable, sending POSTs: {e}")
+        return None
+
+# frames that could not be sent, posted as one catch-up batch once the
+# server answers again; only the latest state of each signal is applied
+backlog = []
+max_backlog = 50
 signals = ["finger1", "finger2", "finger3", "finger4", "finger5", "bicep", "mode"]
 #signals = ["finger1", "finger2", "finger3", "finger4", "finger5"]
 values = []
@@ -76,14 +107,41 @@ try:
 
         payload = {
             "signal": signals,
-            "value": data
+            "value": data,
+            "t": time.time()
         }
+        if device_id is not None:
+            payload["device"] = device_id
+        if stream_port and stream is None and time.monotonic() >= next_connect:
+            stream = connect_stream()
+            next_connect = time.monotonic() + reconnect_interval
         # Send JSON to local server
         try:
-            response = requests.post(url, json=payload)
-            print(f"Server response: {response.status_code} - {response.text}")
-        except requests.exceptions.RequestException as e:
+            if backlog:
+                # catching up always goes as one POSTed batch
+                batch = {"frames": backlog + [payload]}
+                if device_id is not None:
+                    batch["device"] = device_id
+                response = session.post(url, json=batch)
+                print(f"Server response: {response.status_code} - {response.text}")
+                backlog = []
+            elif stream is not None:
+                stream.send(signals, data)
+            else:
+                response = session.post(url, json=payload)
+                print(f"Server response: {response.status_code} - {response.text}")
+        except (requests.exceptions.RequestException, OSError) as e:
             print(f"Error sending data: {e}")
+            if stream is not None and stream.closed:
+                # the stream is gone; POST until it can be reopened
+                stream.close()
+                stream = None
+                next_connect = time.monotonic() + reconnect_interval
+            backlog = (backlog + [payload])[-max_backlog:]
+        except ValueError as e:
+            # names or states the server's schema does not have; sending the
+            # frame again would not help
+            print(f"Frame not sent: {e}")
 
         ser.reset_input_buffer()
 
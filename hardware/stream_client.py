@@ -0,0 +1,209 @@
+##################################################################
+# sender side of api.py's signal stream (signal_stream.py there):
+# one TCP connection, frames are a 4-byte big-endian length and JSON
+# and of its UDP listener (signal_udp.py): one frame per datagram.
+# Both can send binary frames that index into the server's signals.json
+# (signal_codec.py there) instead of JSON.
+##################################################################
+import hashlib
+import json
+import socket
+import struct
+import threading
+import time
+import urllib.request
+
+LENGTH = struct.Struct(">I")
+DATAGRAM_HEADER = struct.Struct(">BIQ")
+KIND_JSON = ord("J")
+KIND_BINARY = ord("B")
+SCHEMA_ID = struct.Struct(">I")
+KIND_FULL = 1
+KIND_PARTIAL = 2
+
+
+class SignalSchema:
+    # must build the same id and frames as signal_codec.SignalSchema
+    def __init__(self, signals):
+        self.signals = signals
+        self.names = list(signals)
+        self.states = [list(states) for states in signals.values()]
+        self._index = {name: (i, {state: j for j, state in enumerate(states)})
+                       for i, (name, states) in enumerate(zip(self.names, self.states))}
+        canonical = json.dumps([[name, states] for name, states in zip(self.names, self.states)],
+                               separators=(",", ":")).encode()
+        self.id = int.from_bytes(hashlib.blake2b(canonical, digest_size=4).digest(), "big")
+
+    def encode(self, signal, value):
+        if isinstance(signal, str):
+            signal, value = [signal], [value]
+        if len(signal) != len(value):
+            raise ValueError(f"{len(signal)} signals but {len(value)} values")
+        try:
+            if signal == self.names:
+                return bytes([KIND_FULL] + [self._index[name][1][state] for name, state in zip(signal, value)])
+            body = [KIND_PARTIAL, len(signal)]
+            for name, state in zip(signal, value):
+                i, states = self._index[name]
+                body += (i, states[state])
+        except KeyError as e:
+            raise ValueError(f"{e.args[0]!r} is not in schema {self.id:08x}") from None
+        return bytes(body)
+
+    def decode(self, payload):
+        if payload[0] == KIND_FULL:
+            return list(self.names), [self.states[i][j] for i, j in enumerate(payload[1:])]
+        pairs = payload[2:]
+        return ([self.names[pairs[k]] for k in range(0, len(pairs), 2)],
+                [self.states[pairs[k]][pairs[k + 1]] for k in range(0, len(pairs), 2)])
+
+
+def fetch_schema(api_url="http://127.0.0.1:7001", timeout=5.0):
+    with urllib.request.urlopen(api_url + "/schema", timeout=timeout) as response:
+        description = json.load(response)
+    schema = SignalSchema(description["signals"])
+    assert schema.id == description["id"], "schema id mismatch, check signal_codec.py"
+    return schema
+
+
+class SignalStream:
+    # send() does not wait for the server: frames are pipelined and the
+    # server acknowledges them in batches. It only blocks when `window`
+    # frames are unacknowledged, which is the server's flow control.
+    # With a schema (see fetch_schema), frames go out binary once the
+    # server has agreed to it. device names this sender's session on the
+    # server; without one it shares the default session.
+    def __init__(self, host="127.0.0.1", port=7003, timeout=5.0, schema=None, device=None):
+        self.timeout = timeout
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(None)
+        self.seq = 0
+        self.acked = 0
+        self.window = 0  # until the server's first ack
+        self.closed = False
+        self.schema = None
+        self._schema_reply = None
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_acks, name="stream-acks", daemon=True)
+        self._reader.start()
+        if device is not None:
+            self._send({"device": device})
+        if schema is not None:
+            self.negotiate(schema)
+
+    def negotiate(self, schema):
+        self._send({"schema": schema.id})
+        reply = self._schema_reply if self.flush() else None
+        if reply is None:
+            raise ConnectionError("server did not answer the schema")
+        if reply.get("schema") != schema.id:
+            raise ValueError(f"server schema is {reply.get('expected')}, not {schema.id}; fetch it again")
+        self.schema = schema
+
+    def send(self, signal, value):
+        if self.schema is not None:
+            return self._send(None, self.schema.encode(signal, value))
+        return self._send({"signal": signal, "value": value})
+
+    def _send(self, message, payload=None):
+        with self._send_lock:
+            with self._cond:
+                deadline = time.monotonic() + self.timeout
+                while not self.closed and self.seq - self.acked >= self.window:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"server has not acknowledged {self.seq - self.acked} frames")
+                    self._cond.wait(remaining)
+                if self.closed:
+                    raise ConnectionError("signal stream closed")
+                self.seq += 1
+                seq = self.seq
+            if payload is None:
+                payload = json.dumps(dict({"seq": seq}, **message)).encode()
+            self.sock.sendall(LENGTH.pack(len(payload)) + payload)
+            return seq
+
+    def flush(self, timeout=None):
+        # wait until every frame sent so far is acknowledged
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._cond:
+            while not self.closed and self.acked < self.seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return self.acked >= self.seq
+
+    def _acknowledged(self, seq, window):
+        with self._cond:
+            self.acked = max(self.acked, seq)
+            self.window = window
+            self._cond.notify_all()
+
+    def _read_acks(self):
+        buffer = bytearray()
+        try:
+            while True:
+                chunk = self.sock.recv(4096)
+                if not chunk:
+                    break
+                buffer += chunk
+                while len(buffer) >= LENGTH.size:
+                    (length,) = LENGTH.unpack_from(buffer)
+                    if len(buffer) < LENGTH.size + length:
+                        break
+                    message = json.loads(bytes(buffer[LENGTH.size:LENGTH.size + length]))
+                    del buffer[:LENGTH.size + length]
+                    if "schema" in message:
+                        self._schema_reply = message
+                    self._acknowledged(message["ack"], message["window"])
+        except OSError:
+            pass
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self._reader.join(1.0)
+
+
+class SignalDatagrams:
+    # fire and forget: nothing is acknowledged or resent, the server drops
+    # datagrams that arrive out of order or too late. With a schema every
+    # datagram is binary and carries the schema id; the server drops it if
+    # its own schema has changed since. device names this sender's session
+    # on the server; binary datagrams have no room for it.
+    def __init__(self, host="127.0.0.1", port=7004, schema=None, device=None):
+        if schema is not None and device is not None:
+            raise ValueError("binary datagrams cannot carry a device id")
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.seq = 0
+        self.schema = schema
+        self.device = device
+        self._lock = threading.Lock()
+
+    def send(self, signal, value):
+        if self.schema is not None:
+            body = SCHEMA_ID.pack(self.schema.id) + self.schema.encode(signal, value)
+        else:
+            message = {"signal": signal, "value": value}
+            if self.device is not None:
+                message["device"] = self.device
+            body = json.dumps(message).encode()
+        with self._lock:
+            self.seq += 1
+            header = DATAGRAM_HEADER.pack(KIND_BINARY if self.schema is not None else KIND_JSON,
+                                          self.seq, int(time.time() * 1e6))
+            self.sock.sendto(header + body, self.address)
+            return self.seq
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,734 @@
+import ast
+import itertools
+import json
+import operator
+import os
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+MAPPING_PATH = "mapping.json"
+RULES_PATH = "mapping.rules.json"
+SIGNALS_PATH = "signals.json"
+JOURNAL_SUFFIX = ".journal"
+
+StateTuple = Tuple[str, ...]
+
+
+def parse_key(key: str) -> StateTuple:
+    # mapping.json keys are the Python repr of a list: "['a', 'b']". repr
+    # only single-quotes a string that contains no quote, so those keys can
+    # be split directly; anything else goes through literal_eval.
+    if key.startswith("['") and key.endswith("']") and "\\" not in key:
+        return tuple(key[2:-2].split("', '"))
+    return tuple(ast.literal_eval(key))
+
+
+def format_key(states) -> str:
+    return str(list(states))
+
+
+def covered_rules(pattern: StateTuple, rules) -> List[StateTuple]:
+    # The keys of rules that pattern fully covers: the ones that agree with
+    # every position pattern fixes ("*" in a rule is only covered by "*")
+    fixed = [i for i, p in enumerate(pattern) if p != "*"]
+    if len(fixed) == len(pattern):
+        # a single combination only covers itself
+        return [pattern] if pattern in rules else []
+    if not fixed:
+        return list(rules)
+    states = operator.itemgetter(*fixed)
+    wanted = states(pattern)
+    return [k for k in rules if states(k) == wanted]
+
+
+def migrate_rules(rules, old_signals: Dict[str, List[str]], new_signals: Dict[str, List[str]]):
+    # Carry {pattern: tasks} rules over a signals.json change by signal
+    # name: added signals become "*", removed signals are projected away.
+    # A projected rule drops every older one it now fully covers, as
+    # /add_mapping would; anything dropped is reported as a conflict.
+    old_pos = {name: i for i, name in enumerate(old_signals)}
+    projected = []
+    conflicts = []
+    for pattern, tasks in rules.items():
+        if len(pattern) != len(old_pos):
+            conflicts.append({"pattern": format_key(pattern), "dropped": tasks,
+                              "reason": "pattern does not match the previous signals"})
+            continue
+        new_pattern = []
+        for name, states in new_signals.items():
+            i = old_pos.get(name)
+            state = "*" if i is None else pattern[i]
+            if state != "*" and state not in states:
+                conflicts.append({"pattern": format_key(pattern), "dropped": tasks,
+                                  "reason": f"state '{state}' no longer exists for signal '{name}'"})
+                break
+            new_pattern.append(state)
+        else:
+            projected.append((tuple(new_pattern), tasks, pattern))
+    kept: Dict[StateTuple, Tuple[Optional[List[str]], StateTuple]] = {}
+    for new_pattern, tasks, pattern in projected:
+        for older in covered_rules(new_pattern, kept):
+            older_tasks, older_pattern = kept.pop(older)
+            if older_tasks != tasks:
+                conflict = {"pattern": format_key(older_pattern), "dropped": older_tasks,
+                            "kept": tasks, "into": format_key(older)}
+                if older == new_pattern:
+                    conflict["reason"] = "collides with a newer rule after migration"
+                else:
+                    conflict["by"] = format_key(new_pattern)
+                    conflict["reason"] = "shadowed by a newer rule after migration"
+                conflicts.append(conflict)
+        kept[new_pattern] = (tasks, pattern)
+    return {new_pattern: tasks for new_pattern, (tasks, _) in kept.items()}, conflicts
+
+
+def compile_or_report(compiler, tasks, where: str):
+    # Programs are compiled when a mapping is loaded; a bad one is reported
+    # here and left unmapped rather than failing at dispatch time
+    try:
+        return compiler(tasks)
+    except ValueError as e:
+        print(f"Invalid action program {tasks} for {where}: {e}")
+        return None
+
+
+def file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def iter_json(items, chunk_size: int = 65536) -> Iterator[bytes]:
+    # Same bytes as json.dumps(dict(items)) but produced in chunks, so a
+    # large mapping view never has to exist as one dict or string
+    buf = ["{"]
+    size = 1
+    first = True
+    for key, value in items:
+        part = ("" if first else ", ") + json.dumps(key) + ": " + json.dumps(value)
+        first = False
+        buf.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield "".join(buf).encode()
+            buf = []
+            size = 0
+    buf.append("}")
+    yield "".join(buf).encode()
+
+
+def write_snapshot(path: str, items, tmp_path: Optional[str] = None) -> str:
+    # The mapping file as save() has always written it, to a temporary file
+    # the caller moves into place with os.replace; returns its path
+    tmp_path = tmp_path or path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump({format_key(states): tasks for states, tasks in items}, file, indent=4)
+    return tmp_path
+
+
+def _as_stamp(value) -> Optional[Tuple[int, int]]:
+    return None if value is None else tuple(value)
+
+
+class MappingJournal:
+    # Append-only log of the assign() calls made since the mapping file was
+    # last written. The first line is {"base": stamp}, the file_stamp of the
+    # snapshot the entries apply to; each further line is one JSON
+    # [pattern key, tasks]. Replaying a journal over its snapshot restores
+    # the table as it was before a crash. Replaying entries the snapshot
+    # already holds is harmless, since the last write to a combination wins
+    # either way. A journal over any other snapshot is dropped: the file
+    # was replaced behind our back, or a full save() finished before the
+    # journal was restarted.
+    def __init__(self, path: str, max_bytes: int = 1 << 20, max_age: float = 30.0):
+        self.path = path + JOURNAL_SUFFIX
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.size = 0
+        self.pending = 0
+        self._file = None
+        self._header = 0
+        self._oldest: Optional[float] = None
+        self._counts = {"appended": 0, "replayed": 0, "discarded": 0, "compactions": 0}
+        self._compaction_ms = 0.0
+
+    def _read(self, path: str, base) -> Optional[List[Tuple[StateTuple, Optional[List[str]]]]]:
+        # The entries of the journal at path if it applies to base, else
+        # None. A torn last line from a crash mid-append is cut off.
+        try:
+            file = open(path, "r+b")
+        except FileNotFoundError:
+            return None
+        with file:
+            try:
+                header = json.loads(file.readline())
+                if _as_stamp(header["base"]) != base:
+                    return None
+            except (ValueError, TypeError, KeyError):
+                return None
+            entries = []
+            good = file.tell()
+            for line in file:
+                try:
+                    key, tasks = json.loads(line)
+                except (ValueError, TypeError):
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                entries.append((parse_key(key), tasks))
+                good += len(line)
+            file.truncate(good)
+        return entries
+
+    def _open(self, entries: int):
+        self.close()
+        self._file = open(self.path, "ab")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self.pending = entries
+        self._oldest = time.monotonic() if entries else None
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def recover(self, base) -> List[Tuple[StateTuple, Optional[List[str]]]]:
+        # Called whenever the snapshot with stamp base is (re)loaded;
+        # returns the entries to replay over it
+        entries = self._read(self.path, base)
+        if entries is None:
+            # a compaction stopped between moving the snapshot and the journal
+            entries = self._read(self.path + ".tmp", base)
+            if entries is not None:
+                os.replace(self.path + ".tmp", self.path)
+        if entries is None:
+            if os.path.exists(self.path):
+                self._counts["discarded"] += 1
+            self.restart(base)
+            return []
+        self._header = len(json.dumps({"base": base})) + 1
+        self._open(len(entries))
+        self._counts["replayed"] += len(entries)
+        return entries
+
+    def prepare(self, base, tail: bytes = b""):
+        # Write the next journal, over snapshot base and holding the entry
+        # lines in tail, beside the current one; commit() moves it in
+        header = json.dumps({"base": base}).encode() + b"\n"
+        with open(self.path + ".tmp", "wb") as file:
+            file.write(header + tail)
+        self._header = len(header)
+
+    def commit(self, entries: int = 0):
+        self.close()
+        os.replace(self.path + ".tmp", self.path)
+        self._open(entries)
+
+    def restart(self, base):
+        # An empty journal over a snapshot that was just written in full
+        self.prepare(base)
+        self.commit()
+
+    def tail(self, offset: int) -> bytes:
+        with open(self.path, "rb") as file:
+            file.seek(offset)
+            return file.read()
+
+    def append(self, pattern, tasks: Optional[List[str]]):
+        line = json.dumps([format_key(pattern), tasks]).encode() + b"\n"
+        self._file.write(line)
+        self._file.flush()
+        self.size += len(line)
+        self.pending += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        self._counts["appended"] += 1
+
+    def due(self, now: Optional[float] = None) -> bool:
+        if not self.pending:
+            return False
+        if self.size - self._header >= self.max_bytes:
+            return True
+        now = time.monotonic() if now is None else now
+        return self.max_age > 0 and now - self._oldest >= self.max_age
+
+    def compacted(self, seconds: float):
+        self._counts["compactions"] += 1
+        self._compaction_ms = seconds * 1000
+
+    def metrics(self) -> Dict[str, object]:
+        return dict(self._counts, pending=self.pending, bytes=self.size, last_compaction_ms=self._compaction_ms)
+
+
+def compact_journal(table, lock, force: bool = False) -> bool:
+    # Fold table's journal into a fresh snapshot of its mapping file. The
+    # table is copied under lock, the lock every caller holds around it,
+    # but serialised and written outside it so lookups keep going; entries
+    # appended meanwhile are carried over into the next journal. Returns
+    # whether a snapshot was written.
+    journal = table.journal
+    with lock:
+        if journal is None or not (journal.due() or force and journal.pending):
+            return False
+        generation = table.generation
+        offset, entries = journal.size, journal.pending
+        items = table._entries()
+    start = time.perf_counter()
+    tmp_path = write_snapshot(table.path, items, table.path + ".compact")
+    base = file_stamp(tmp_path)
+    with lock:
+        if table.generation != generation or file_stamp(table.path) != table._stamp:
+            # a full save() or an outside write got there first
+            os.remove(tmp_path)
+            return False
+        journal.prepare(base, journal.tail(offset))
+        os.replace(tmp_path, table.path)
+        table._stamp = base
+        journal.commit(journal.pending - entries)
+        journal.compacted(time.perf_counter() - start)
+    return True
+
+
+class PatternIndex:
+    # Per-position state bitsets over the rows of a mapping. Bit i of
+    # _bits[p][state] is set when row i has `state` at position p, so a
+    # wildcard pattern is answered by AND-ing one bitset per fixed position.
+    def __init__(self, keys):
+        self._keys: List[StateTuple] = list(keys)
+        rows: Dict[Tuple[int, str], List[int]] = {}
+        lengths: Dict[int, List[int]] = {}
+        for row, key in enumerate(self._keys):
+            lengths.setdefault(len(key), []).append(row)
+            for pos, state in enumerate(key):
+                rows.setdefault((pos, state), []).append(row)
+        width = max(len(key) for key in self._keys) if self._keys else 0
+        self._by_len: Dict[int, int] = {n: self._bitset(r) for n, r in lengths.items()}
+        self._bits: List[Dict[str, int]] = [{} for _ in range(width)]
+        for (pos, state), r in rows.items():
+            self._bits[pos][state] = self._bitset(r)
+
+    def _bitset(self, rows: List[int]) -> int:
+        buf = bytearray((len(self._keys) + 7) // 8)
+        for row in rows:
+            buf[row >> 3] |= 1 << (row & 7)
+        return int.from_bytes(buf, "little")
+
+    def match(self, pattern) -> List[StateTuple]:
+        mask = self._by_len.get(len(pattern), 0)
+        for pos, state in enumerate(pattern):
+            if not mask:
+                break
+            if state != "*":
+                mask &= self._bits[pos].get(state, 0)
+        results = []
+        if not mask:
+            return results
+        keys = self._keys
+        for i, byte in enumerate(mask.to_bytes((mask.bit_length() + 7) // 8, "little")):
+            while byte:
+                low = byte & -byte
+                results.append(keys[(i << 3) + low.bit_length() - 1])
+                byte ^= low
+        return results
+
+
+class MappingTable:
+    # In-memory copy of mapping.json keyed by state tuple. The file is only
+    # re-parsed when its mtime/size changes or after invalidate(). With a
+    # compiler, assigned entries are also compiled into programs on load.
+    # With a journal, assign() appends to it instead of rewriting the file,
+    # and loading the file replays it.
+    #
+    # lookup() and lookup_program() read copies of the table published by
+    # the last refresh() or write as one reference, so they take no lock and
+    # never stat the file; the writers (refresh, assign, reset, migrate)
+    # must be serialised by the caller. Changes made by other processes are
+    # seen at the next refresh().
+    def __init__(self, path: str = MAPPING_PATH, compiler=None, journal: Optional[MappingJournal] = None):
+        self.path = path
+        self.compiler = compiler
+        self.journal = journal
+        self.generation = 0
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._table: Dict[StateTuple, Optional[List[str]]] = {}
+        self._programs: Dict[StateTuple, object] = {}
+        self._index: Optional[PatternIndex] = None
+        self._published: Tuple[Dict[StateTuple, Optional[List[str]]], Dict[StateTuple, object]] = ({}, {})
+
+    def invalidate(self):
+        self._stamp = None
+
+    def _publish(self):
+        self._published = (dict(self._table), dict(self._programs))
+
+    def refresh(self):
+        stamp = file_stamp(self.path)
+        if stamp is not None and stamp == self._stamp:
+            return
+        table: Dict[StateTuple, Optional[List[str]]] = {}
+        if stamp is not None:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+            for key, tasks in data.items():
+                table[parse_key(key)] = tasks
+        self._table = table
+        self._index = None
+        self._stamp = stamp
+        self.generation += 1
+        if self.journal is not None:
+            for pattern, tasks in self.journal.recover(stamp):
+                self._apply(pattern, tasks)
+            if stamp is None:
+                self.save()
+        self._compile_all()
+        self._publish()
+
+    def _compile_all(self):
+        self._programs = {}
+        if self.compiler is None:
+            return
+        for states, tasks in self._table.items():
+            if tasks is not None:
+                self._programs[states] = compile_or_report(self.compiler, tasks, format_key(states))
+
+    def lookup(self, states: StateTuple) -> Optional[List[str]]:
+        return self._published[0].get(states)
+
+    def lookup_program(self, states: StateTuple):
+        return self._published[1].get(states)
+
+    def match(self, pattern) -> List[StateTuple]:
+        # pattern is a list of states where "*" matches any state
+        self.refresh()
+        return self._match(pattern)
+
+    def _match(self, pattern) -> List[StateTuple]:
+        if self._index is None:
+            self._index = PatternIndex(self._table.keys())
+        return self._index.match(pattern)
+
+    def _apply(self, pattern, tasks: Optional[List[str]]) -> List[StateTuple]:
+        matches = self._match(pattern)
+        for states in matches:
+            self._table[states] = tasks
+        return matches
+
+    def assign(self, pattern, tasks: Optional[List[str]]) -> int:
+        # Set tasks on every existing combination matching pattern and
+        # persist; returns the number of combinations updated
+        self.refresh()
+        matches = self._apply(pattern, tasks)
+        program = None
+        if self.compiler is not None and tasks is not None:
+            program = compile_or_report(self.compiler, tasks, format_key(pattern))
+        for states in matches:
+            if program is None:
+                self._programs.pop(states, None)
+            else:
+                self._programs[states] = program
+        if self.journal is None:
+            self.save()
+        elif matches:
+            self.journal.append(pattern, tasks)
+        if matches:
+            self._publish()
+        return len(matches)
+
+    def _entries(self) -> List[Tuple[StateTuple, Optional[List[str]]]]:
+        return list(self._table.items())
+
+    def save(self):
+        os.replace(write_snapshot(self.path, self._table.items()), self.path)
+        # values changed but keys did not, so the index stays valid
+        self._stamp = file_stamp(self.path)
+        self.generation += 1
+        if self.journal is not None:
+            self.journal.restart(self._stamp)
+
+    def reset(self, signals: Dict[str, List[str]]):
+        # Every combination of the new signal set, unassigned
+        self._table = {combo: None for combo in itertools.product(*signals.values())}
+        self._programs = {}
+        self._index = None
+        self.save()
+        self._publish()
+
+    def migrate(self, old_signals: Dict[str, List[str]], new_signals: Dict[str, List[str]]):
+        # Assigned combinations are carried over as rules and expanded back
+        # into the new product; unassigned ones are not visited again. The
+        # dense table has no write history, so on a collision the later
+        # combination in signals.json order is the one kept.
+        self.refresh()
+        assigned = {states: tasks for states, tasks in self._table.items() if tasks is not None}
+        rules, conflicts = migrate_rules(assigned, old_signals, new_signals)
+        value_lists = list(new_signals.values())
+        table: Dict[StateTuple, Optional[List[str]]] = {combo: None for combo in itertools.product(*value_lists)}
+        for pattern, tasks in rules.items():
+            choices = [states if p == "*" else [p] for p, states in zip(pattern, value_lists)]
+            for combo in itertools.product(*choices):
+                table[combo] = tasks
+        self._table = table
+        self._index = None
+        self._compile_all()
+        self.save()
+        self._publish()
+        return conflicts
+
+    def view(self) -> Iterator[Tuple[str, Optional[List[str]]]]:
+        self.refresh()
+        for states, tasks in self._table.items():
+            yield format_key(states), tasks
+
+    def __len__(self):
+        self.refresh()
+        return len(self._table)
+
+
+def _overlaps(pattern: StateTuple, other: StateTuple) -> bool:
+    return all(p == "*" or o == "*" or p == o for p, o in zip(pattern, other))
+
+
+class RuleIndex(NamedTuple):
+    # What a SparseMapping lookup reads: published as one reference and
+    # never modified afterwards, apart from memo
+    width: int
+    bits: Tuple[Dict[str, int], ...]
+    live: int
+    by_seq: Dict[int, Tuple[int, Optional[List[str]], object]]
+    memo: Dict[StateTuple, Optional[Tuple[int, Optional[List[str]], object]]]
+
+
+class SparseMapping:
+    # Only assigned combinations and wildcard rules are stored, in
+    # mapping.rules.json as {"['a', '*']": [...tasks], ...}, oldest first.
+    #
+    # Precedence is the same as repeated /add_mapping calls on the dense
+    # table: the most recently written rule that matches wins. A new rule
+    # drops any older rule it fully covers, and a null rule is only kept
+    # while it still shadows something older.
+    #
+    # Every rule gets a sequence number, newest highest, and each
+    # (position, state) keeps a bitset of the rules that match it there; a
+    # "*" rule is set in every state of its position. Resolving a
+    # combination ANDs one bitset per position and takes the highest set
+    # bit, O(signals) however many wildcard shapes are stored. Resolved
+    # combinations are memoised until the next write; the memo starts over
+    # once it holds cache_size of them, so it never grows toward the full
+    # product. A journal works as in MappingTable, and lookups read a
+    # published RuleIndex without a lock the way MappingTable's do.
+    def __init__(self, path: str = RULES_PATH, signals_path: str = SIGNALS_PATH, compiler=None,
+                 journal: Optional[MappingJournal] = None, cache_size: int = 4096):
+        self.path = path
+        self.signals_path = signals_path
+        self.compiler = compiler
+        self.cache_size = cache_size
+        self.journal = journal
+        self.generation = 0
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._signals_stamp: Optional[Tuple[int, int]] = None
+        self._signals: Dict[str, List[str]] = {}
+        self._rules: Dict[StateTuple, Optional[List[str]]] = {}
+        self._bits: List[Dict[str, int]] = []
+        self._all = 0
+        self._seqs: Dict[StateTuple, int] = {}
+        self._by_seq: Dict[int, Tuple[int, Optional[List[str]], object]] = {}
+        self._seq = 0
+        self._published = RuleIndex(0, (), 0, {}, {})
+
+    def invalidate(self):
+        self._stamp = None
+        self._signals_stamp = None
+
+    def refresh(self):
+        signals_changed = False
+        signals_stamp = file_stamp(self.signals_path)
+        if signals_stamp is None or signals_stamp != self._signals_stamp:
+            signals = {}
+            if signals_stamp is not None:
+                with open(self.signals_path, "r") as file:
+                    signals = json.load(file)
+            self._signals = signals
+            self._signals_stamp = signals_stamp
+            signals_changed = True
+        stamp = file_stamp(self.path)
+        if stamp is not None and stamp == self._stamp:
+            if signals_changed:
+                # the bitsets list the states of each position
+                self._rebuild()
+                self._publish()
+            return
+        rules: Dict[StateTuple, Optional[List[str]]] = {}
+        if stamp is not None:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+            for key, tasks in data.items():
+                rules[parse_key(key)] = tasks
+        self._rules = rules
+        self._stamp = stamp
+        self.generation += 1
+        self._rebuild()
+        if self.journal is not None:
+            for pattern, tasks in self.journal.recover(stamp):
+                self._apply(pattern, tasks)
+            if stamp is None:
+                self.save()
+        self._publish()
+
+    def _rebuild(self):
+        self._bits = [dict.fromkeys(states, 0) for states in self._signals.values()]
+        self._all = 0
+        self._seqs = {}
+        self._by_seq = {}
+        self._seq = 0
+        for pattern, tasks in self._rules.items():
+            self._index_rule(pattern, tasks)
+
+    def _publish(self):
+        self._published = RuleIndex(len(self._bits), tuple(dict(index) for index in self._bits), self._all,
+                                    dict(self._by_seq), {})
+
+    def _index_rule(self, pattern: StateTuple, tasks: Optional[List[str]]):
+        # seq orders rules by age; it only ever grows between rebuilds.
+        # A rule that does not fit signals.json can never match and is not
+        # indexed.
+        if len(pattern) != len(self._bits):
+            return
+        program = None
+        if self.compiler is not None and tasks is not None:
+            program = compile_or_report(self.compiler, tasks, format_key(pattern))
+        seq = self._seq
+        self._seq += 1
+        bit = 1 << seq
+        for index, p in zip(self._bits, pattern):
+            if p == "*":
+                for state in index:
+                    index[state] |= bit
+            else:
+                index[p] = index.get(p, 0) | bit
+        self._all |= bit
+        self._seqs[pattern] = seq
+        self._by_seq[seq] = (seq, tasks, program)
+
+    def _unindex_rule(self, pattern: StateTuple):
+        seq = self._seqs.pop(pattern, None)
+        if seq is None:
+            return
+        del self._by_seq[seq]
+        mask = ~(1 << seq)
+        for index, p in zip(self._bits, pattern):
+            if p == "*":
+                for state in index:
+                    index[state] &= mask
+            else:
+                index[p] &= mask
+        self._all &= mask
+
+    @staticmethod
+    def _resolve(rules: RuleIndex, states: StateTuple):
+        # the newest rule matching at every position
+        bits = rules.live
+        for index, state in zip(rules.bits, states):
+            bits &= index.get(state, 0)
+            if not bits:
+                return None
+        return rules.by_seq[bits.bit_length() - 1] if bits else None
+
+    def _lookup(self, states: StateTuple):
+        rules = self._published
+        memo = rules.memo
+        try:
+            return memo[states]
+        except KeyError:
+            pass
+        if len(states) != rules.width:
+            return None
+        hit = self._resolve(rules, states)
+        if len(memo) >= self.cache_size:
+            # concurrent readers could not keep a recency order safely
+            memo.clear()
+        memo[states] = hit
+        return hit
+
+    def lookup(self, states: StateTuple) -> Optional[List[str]]:
+        hit = self._lookup(states)
+        return None if hit is None else hit[1]
+
+    def lookup_program(self, states: StateTuple):
+        hit = self._lookup(states)
+        return None if hit is None else hit[2]
+
+    def assign(self, pattern, tasks: Optional[List[str]]) -> int:
+        # Store pattern as the newest rule; returns the number of
+        # combinations it covers (0 if it does not fit signals.json)
+        self.refresh()
+        matched = self._apply(pattern, tasks)
+        if not matched:
+            return 0
+        if self.journal is None:
+            self.save()
+        else:
+            self.journal.append(pattern, tasks)
+            self._publish()
+        return matched
+
+    def _apply(self, pattern, tasks: Optional[List[str]]) -> int:
+        # Store the rule and update the groups in place
+        pattern = tuple(pattern)
+        value_lists = list(self._signals.values())
+        if len(pattern) != len(value_lists):
+            return 0
+        matched = 1
+        for p, states in zip(pattern, value_lists):
+            if p == "*":
+                matched *= len(states)
+            elif p not in states:
+                return 0
+        for k in covered_rules(pattern, self._rules):
+            del self._rules[k]
+            self._unindex_rule(k)
+        if tasks is not None or any(_overlaps(pattern, k) for k in self._rules):
+            self._rules[pattern] = tasks
+            self._index_rule(pattern, tasks)
+        return matched
+
+    def _entries(self) -> List[Tuple[StateTuple, Optional[List[str]]]]:
+        return list(self._rules.items())
+
+    def save(self):
+        os.replace(write_snapshot(self.path, self._rules.items()), self.path)
+        self._stamp = file_stamp(self.path)
+        self.generation += 1
+        if self.journal is not None:
+            self.journal.restart(self._stamp)
+        self._rebuild()
+        self._publish()
+
+    def reset(self, signals: Dict[str, List[str]]):
+        self._signals = signals
+        self._signals_stamp = None
+        self._rules = {}
+        self.save()
+
+    def migrate(self, old_signals: Dict[str, List[str]], new_signals: Dict[str, List[str]]):
+        # Only the stored rules are rewritten, the product is never built
+        self.refresh()
+        self._rules, conflicts = migrate_rules(self._rules, old_signals, new_signals)
+        self._signals = new_signals
+        self._signals_stamp = None
+        self.save()
+        return conflicts
+
+    def view(self) -> Iterator[Tuple[str, Optional[List[str]]]]:
+        # Dense-compatible {combination: tasks} for GET /mapping, generated
+        # on demand and not memoised
+        self.refresh()
+        rules = self._published
+        for combo in itertools.product(*self._signals.values()):
+            hit = self._resolve(rules, combo)
+            yield format_key(combo), None if hit is None else hit[1]
+
+    def __len__(self):
+        self.refresh()
+        return len(self._rules)
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from mapping_store import file_stamp
+
+# Binary signal frames. Instead of repeating every signal name and state
+# string, a frame carries indices into the signals.json schema:
+#   KIND_FULL     one state index byte per signal, in schema order
+#   KIND_PARTIAL  a count byte, then (signal index, state index) byte pairs
+# Both ends must hold the same schema. SignalSchema.id, a 32-bit hash of the
+# ordered signals and states, identifies it; it is agreed once per stream
+# connection (see signal_stream.py) and carried in every binary datagram
+# (see signal_udp.py). The sender side is hardware/stream_client.py.
+KIND_FULL = 1
+KIND_PARTIAL = 2
+MAX_INDEX = 255
+
+
+class SignalSchema:
+    def __init__(self, signals: Dict[str, List[str]]):
+        if len(signals) > MAX_INDEX or any(len(states) > MAX_INDEX for states in signals.values()):
+            raise ValueError(f"binary frames support at most {MAX_INDEX} signals and states per signal")
+        self.signals = signals
+        self.names = list(signals)
+        self.states = [list(states) for states in signals.values()]
+        self._index = {name: (i, {state: j for j, state in enumerate(states)})
+                       for i, (name, states) in enumerate(zip(self.names, self.states))}
+        canonical = json.dumps([[name, states] for name, states in zip(self.names, self.states)],
+                               separators=(",", ":")).encode()
+        self.id = int.from_bytes(hashlib.blake2b(canonical, digest_size=4).digest(), "big")
+
+    def describe(self) -> Dict[str, object]:
+        # body of GET /schema; a sender builds the same schema from "signals"
+        return {"id": self.id, "signals": self.signals}
+
+    def encode(self, signal, value) -> bytes:
+        # signal/value are one name and state or parallel lists of them, as
+        # in the /receive_signals body
+        if isinstance(signal, str):
+            signal, value = [signal], [value]
+        if len(signal) != len(value):
+            raise ValueError(f"{len(signal)} signals but {len(value)} values")
+        try:
+            if signal == self.names:
+                return bytes([KIND_FULL] + [self._index[name][1][state] for name, state in zip(signal, value)])
+            body = [KIND_PARTIAL, len(signal)]
+            for name, state in zip(signal, value):
+                i, states = self._index[name]
+                body += (i, states[state])
+        except KeyError as e:
+            raise ValueError(f"{e.args[0]!r} is not in schema {self.id:08x}") from None
+        return bytes(body)
+
+    def decode(self, payload: bytes) -> Tuple[List[str], List[str]]:
+        try:
+            kind = payload[0]
+            if kind == KIND_FULL:
+                indices = payload[1:]
+                if len(indices) != len(self.names):
+                    raise ValueError(f"full frame has {len(indices)} states, schema has {len(self.names)} signals")
+                return list(self.names), [self.states[i][j] for i, j in enumerate(indices)]
+            if kind == KIND_PARTIAL:
+                count = payload[1]
+                if len(payload) != 2 + 2 * count:
+                    raise ValueError(f"partial frame of {len(payload)} bytes for {count} signals")
+                pairs = payload[2:]
+                return ([self.names[pairs[k]] for k in range(0, 2 * count, 2)],
+                        [self.states[pairs[k]][pairs[k + 1]] for k in range(0, 2 * count, 2)])
+        except IndexError:
+            raise ValueError(f"frame does not match schema {self.id:08x}") from None
+        raise ValueError(f"unknown binary frame kind {kind}")
+
+    def decode_frame(self, payload: bytes) -> Dict[str, List[str]]:
+        signal, value = self.decode(payload)
+        return {"signal": signal, "value": value}
+
+
+class SchemaCache:
+    # The current schema, rebuilt from load() only after invalidate() or
+    # when one of `paths` changes on disk.
+    def __init__(self, load: Callable[[], Dict[str, List[str]]], paths: Sequence[str] = ()):
+        self.load = load
+        self.paths = list(paths)
+        self._lock = threading.Lock()
+        self._schema: Optional[SignalSchema] = None
+        self._stamps = None
+
+    def get(self) -> SignalSchema:
+        stamps = tuple(file_stamp(path) for path in self.paths)
+        with self._lock:
+            if self._schema is None or stamps != self._stamps:
+                self._schema = SignalSchema(self.load())
+                self._stamps = stamps
+            return self._schema
+
+    def invalidate(self):
+        with self._lock:
+            self._schema = None
@@ -0,0 +1,142 @@
+import json
+import socket
+import socketserver
+import struct
+import threading
+from typing import Callable, Dict, Optional
+
+from signal_codec import SignalSchema
+
+# Persistent signal stream. Both directions carry frames made of a 4-byte
+# big-endian length and a JSON object:
+#   sender -> server  {"seq": n, "signal": ..., "value": ...}, the same body
+#                     as POST /receive_signals plus a sequence number
+#                     counting up from 1
+#   server -> sender  {"ack": n, "window": w}: every frame up to n has been
+#                     applied and the sender may have up to w frames
+#                     unacknowledged. Sent once on connect (ack 0) and then
+#                     once per batch of frames read together, so a busy
+#                     stream gets one ack for many frames.
+# A sender may switch to binary frames (signal_codec.py), told apart from
+# JSON by not starting with "{". It first sends {"seq": n, "schema": id}
+# with the id from GET /schema; the ack for that batch carries
+# "schema": id if the server's schema matches, or null and "expected": its
+# own id. Binary frames on a connection without an agreed schema are
+# rejected.
+# {"seq": n, "device": id} (also allowed next to "schema") names the sender;
+# every later frame on the connection that has no "device" of its own is
+# passed on with it.
+LENGTH = struct.Struct(">I")
+MAX_FRAME = 65536
+STREAM_PORT = 7003
+
+
+def pack_frame(message: Dict) -> bytes:
+    payload = json.dumps(message).encode()
+    return LENGTH.pack(len(payload)) + payload
+
+
+class StreamServer(socketserver.ThreadingTCPServer):
+    # One thread per connected sender. on_frame(frame) is called for every
+    # frame in order; a frame it rejects is counted and skipped, a broken
+    # stream (oversized or truncated frame) closes the connection.
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, on_frame: Callable[[Dict], None], window: int = 64,
+                 schema: Optional[Callable[[], SignalSchema]] = None):
+        super().__init__(address, _StreamHandler)
+        self.on_frame = on_frame
+        self.window = window
+        self.schema = schema
+        self._lock = threading.Lock()
+        self._counts = {"connections": 0, "open": 0, "frames": 0, "binary_frames": 0, "acks": 0,
+                        "rejected": 0, "overruns": 0}
+
+    def count(self, **deltas: int):
+        with self._lock:
+            for key, delta in deltas.items():
+                self._counts[key] += delta
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+class _StreamHandler(socketserver.BaseRequestHandler):
+    def _ack(self, seq: int, **extra):
+        self.request.sendall(pack_frame(dict({"ack": seq, "window": self.server.window}, **extra)))
+        self.server.count(acks=1)
+
+    def _negotiate(self, schema_id: int) -> Dict:
+        current = self.server.schema() if self.server.schema is not None else None
+        if current is not None and current.id == schema_id:
+            self.schema = current
+            return {"schema": schema_id}
+        self.schema = None
+        return {"schema": None, "expected": current.id if current is not None else None}
+
+    def handle(self):
+        server = self.server
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        server.count(connections=1, open=1)
+        buffer = bytearray()
+        seq = acked = 0
+        self.schema = None
+        self.device = None
+        try:
+            self._ack(0)
+            while True:
+                chunk = self.request.recv(65536)
+                if not chunk:
+                    break
+                buffer += chunk
+                offset = 0
+                frames = binary = rejected = 0
+                negotiated = None
+                while len(buffer) - offset >= LENGTH.size:
+                    (length,) = LENGTH.unpack_from(buffer, offset)
+                    if length > MAX_FRAME:
+                        print(f"Signal stream from {self.client_address}: {length}-byte frame, closing")
+                        return
+                    end = offset + LENGTH.size + length
+                    if end > len(buffer):
+                        break
+                    payload = bytes(buffer[offset + LENGTH.size:end])
+                    offset = end
+                    frames += 1
+                    try:
+                        if payload[:1] != b"{":
+                            seq += 1
+                            binary += 1
+                            if self.schema is None:
+                                raise ValueError("binary frame before a schema was agreed")
+                            frame = self.schema.decode_frame(payload)
+                            if self.device is not None:
+                                frame["device"] = self.device
+                            server.on_frame(frame)
+                            continue
+                        frame = json.loads(payload)
+                        seq = frame.get("seq", seq + 1)
+                        if "signal" not in frame and "frames" not in frame:
+                            if "device" in frame:
+                                self.device = frame["device"]
+                            if "schema" in frame:
+                                negotiated = self._negotiate(frame["schema"])
+                            continue
+                        if self.device is not None:
+                            frame.setdefault("device", self.device)
+                        server.on_frame(frame)
+                    except Exception as e:
+                        rejected += 1
+                        print(f"Signal stream from {self.client_address}: rejected frame: {e}")
+                del buffer[:offset]
+                if frames:
+                    server.count(frames=frames, binary_frames=binary, rejected=rejected,
+                                 overruns=1 if seq - acked > server.window else 0)
+                    self._ack(seq, **(negotiated or {}))
+                    acked = seq
+        except OSError:
+            pass
+        finally:
+            server.count(open=-1)
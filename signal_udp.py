@@ -0,0 +1,114 @@
+import json
+import socketserver
+import struct
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from signal_codec import SignalSchema
+
+# One signal frame per UDP datagram: a header, then the frame.
+#   kind    1 byte, KIND_JSON: the /receive_signals body as JSON follows;
+#           KIND_BINARY: a uint32 schema id and a signal_codec.py frame
+#           follow, dropped unless the id is the server's current schema
+#   seq     uint32, counting up from 1 per sender
+#   sent    uint64, sender wall clock in microseconds
+# Delivery is not guaranteed; only the freshest frame matters. A datagram
+# with a sequence number at or below the last one accepted from the same
+# sender is dropped as reordered, one older than max_age as stale. A
+# sequence number far below the last one is taken as a sender restart.
+HEADER = struct.Struct(">BIQ")
+KIND_JSON = ord("J")
+KIND_BINARY = ord("B")
+SCHEMA_ID = struct.Struct(">I")
+RESTART_GAP = 1024
+UDP_PORT = 7004
+
+
+def pack_datagram(seq: int, message: Dict, sent: float = None) -> bytes:
+    sent = time.time() if sent is None else sent
+    return HEADER.pack(KIND_JSON, seq, int(sent * 1e6)) + json.dumps(message).encode()
+
+
+class DatagramServer(socketserver.UDPServer):
+    # Datagrams are handled one at a time on the serving thread, in arrival
+    # order. on_frame(frame) gets every accepted frame.
+    allow_reuse_address = True
+    max_packet_size = 65507
+
+    def __init__(self, address, on_frame: Callable[[Dict], None], max_age: float = 0.2,
+                 schema: Optional[Callable[[], SignalSchema]] = None):
+        super().__init__(address, _DatagramHandler)
+        self.on_frame = on_frame
+        self.max_age = max_age
+        self.schema = schema
+        self._lock = threading.Lock()
+        self._last_seq: Dict[Tuple[str, int], int] = {}
+        self._counts = {"datagrams": 0, "accepted": 0, "stale": 0, "reordered": 0, "gaps": 0,
+                        "restarts": 0, "malformed": 0, "unknown_schema": 0, "rejected": 0}
+        self._age_total = 0.0
+        self._age_max = 0.0
+
+    def admit(self, sender: Tuple[str, int], seq: int, sent_us: int) -> bool:
+        with self._lock:
+            self._counts["datagrams"] += 1
+            last = self._last_seq.get(sender)
+            if last is not None and seq <= last:
+                if last - seq <= RESTART_GAP:
+                    self._counts["reordered"] += 1
+                    return False
+                self._counts["restarts"] += 1
+                last = None
+            age = time.time() - sent_us / 1e6
+            if self.max_age and age > self.max_age:
+                self._counts["stale"] += 1
+                return False
+            if last is not None and seq > last + 1:
+                self._counts["gaps"] += seq - last - 1
+            self._last_seq[sender] = seq
+            self._counts["accepted"] += 1
+            self._age_total += max(age, 0.0)
+            self._age_max = max(self._age_max, age)
+            return True
+
+    def count(self, key: str):
+        with self._lock:
+            self._counts[key] += 1
+
+    def metrics(self) -> Dict[str, object]:
+        with self._lock:
+            accepted = self._counts["accepted"]
+            return dict(self._counts,
+                        senders=len(self._last_seq),
+                        age_ms={"mean": self._age_total / accepted * 1e3 if accepted else 0.0,
+                                "max": self._age_max * 1e3})
+
+
+class _DatagramHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data = self.request[0]
+        server = self.server
+        try:
+            kind, seq, sent_us = HEADER.unpack_from(data)
+            if kind == KIND_BINARY:
+                (schema_id,) = SCHEMA_ID.unpack_from(data, HEADER.size)
+                schema = server.schema() if server.schema is not None else None
+                if schema is None or schema.id != schema_id:
+                    server.count("unknown_schema")
+                    return
+                frame = schema.decode_frame(data[HEADER.size + SCHEMA_ID.size:])
+            elif kind == KIND_JSON:
+                frame = json.loads(data[HEADER.size:])
+            else:
+                raise ValueError(f"unknown frame kind {kind}")
+        except (struct.error, ValueError) as e:
+            server.count("malformed")
+            print(f"Signal datagram from {self.client_address}: {e}")
+            return
+        if not server.admit(self.client_address, seq, sent_us):
+            return
+        try:
+            server.on_frame(frame)
+        except Exception as e:
+            server.count("rejected")
+            print(f"Signal datagram from {self.client_address}: rejected frame: {e}")
@@ -0,0 +1,48 @@
+import threading
+import time
+from typing import Dict, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+
+class Snapshot(NamedTuple):
+    # one consistent frame of signal state; values and stamps are indexed by
+    # signal position in signals.json, stamps are time.time() of the last
+    # sample of each signal (0.0 before the first)
+    version: int
+    values: Tuple
+    stamps: Tuple[float, ...]
+
+
+class StateStore:
+    # Fused signal state published as immutable snapshots. A writer builds
+    # the next snapshot from the current one and swaps the reference, which
+    # is a single atomic assignment, so snapshot() never takes a lock and
+    # never sees half of a frame. Writers are serialised among themselves;
+    # each publish copies the two n-tuples.
+    def __init__(self, names: Sequence[str]):
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self._write_lock = threading.Lock()
+        self._snapshot = Snapshot(0, (None,) * len(self.names), (0.0,) * len(self.names))
+
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
+
+    def publish(self, updates: Iterable[Tuple[int, object]], now: Optional[float] = None) -> Snapshot:
+        # updates are (signal position, value) pairs, all stamped `now`
+        now = time.time() if now is None else now
+        with self._write_lock:
+            current = self._snapshot
+            values = list(current.values)
+            stamps = list(current.stamps)
+            for i, value in updates:
+                values[i] = value
+                stamps[i] = now
+            snapshot = Snapshot(current.version + 1, tuple(values), tuple(stamps))
+            self._snapshot = snapshot
+        return snapshot
+
+    def as_dict(self, snapshot: Optional[Snapshot] = None) -> Dict[str, object]:
+        snapshot = self._snapshot if snapshot is None else snapshot
+        return {"version": snapshot.version,
+                "signals": {name: {"value": value, "t": stamp}
+                            for name, value, stamp in zip(self.names, snapshot.values, snapshot.stamps)}}